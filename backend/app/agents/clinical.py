@@ -1,10 +1,14 @@
-from typing import List, Dict
+from typing import List, Dict, Iterable, Optional
 from fastapi import APIRouter, HTTPException, Response
 from pydantic import BaseModel, Field
 from datetime import datetime
+from operator import attrgetter
+import heapq
 import logging
 
 from app.services.clinicaltrials import client, TrialHit
+from app.services.evidence import ClinicalEvidence
+from app.services.query_planner import run_planned_search
 
 logger = logging.getLogger("clinical-agent")
 router = APIRouter()
@@ -21,27 +25,28 @@ class ClinicalRequest(BaseModel):
 
 
 # ======================================================
-# SCORING (UNCHANGED)
+# SCORING (BATCH, CONSTANTS PRECOMPUTED)
 # ======================================================
 
-def score_trial(t: TrialHit) -> float:
-    score = 0.0
+PHASE_WEIGHT: Dict[str, float] = {
+    "PHASE4": 5,
+    "PHASE3": 4,
+    "PHASE2": 3,
+    "PHASE1": 2,
+    "EARLY_PHASE1": 1.5
+}
 
-    phase_weight = {
-        "PHASE4": 5,
-        "PHASE3": 4,
-        "PHASE2": 3,
-        "PHASE1": 2,
-        "EARLY_PHASE1": 1.5
-    }
 
-    score += phase_weight.get((t.phase or "").upper(), 1)
+def score_trial(t: TrialHit, current_year: Optional[int] = None) -> float:
+    score = 0.0
+
+    score += PHASE_WEIGHT.get((t.phase or "").upper(), 1)
 
     if "recruit" in t.status.lower():
         score += 2
 
     if t.start_year:
-        age = datetime.now().year - t.start_year
+        age = (current_year or datetime.now().year) - t.start_year
         score += max(0, 3 - age * 0.3)
 
     score += min((t.locations_count or 0) / 10, 2)
@@ -49,10 +54,29 @@ def score_trial(t: TrialHit) -> float:
     return round(score, 2)
 
 
+def score_trials(trials: Iterable[TrialHit]) -> None:
+    """Score a whole pool in place, resolving the clock once per batch."""
+    current_year = datetime.now().year
+    for t in trials:
+        t.score = score_trial(t, current_year)
+
+
+def select_top_trials(trials: List[TrialHit], k: int) -> List[TrialHit]:
+    # heap top-k: O(n log k) instead of sorting the whole pool
+    return heapq.nlargest(k, trials, key=attrgetter("score"))
+
+
 # ======================================================
 # RETRIEVAL — STRICT & CORRECTED
 # ======================================================
 
+def _or_block(conditions: List[str]) -> str:
+    # each synonym parenthesized so multi-word terms keep their implicit AND
+    if len(conditions) == 1:
+        return conditions[0]
+    return " OR ".join(f"({c})" for c in conditions)
+
+
 def retrieve_trials(
     drug: str,
     conditions: List[str],
@@ -64,26 +88,42 @@ def retrieve_trials(
     # 🔒 NORMALIZE CONDITIONS (CRITICAL FIX)
     clean_conditions = [c.strip() for c in conditions if c and c.strip()]
 
-    # CASE 1: drug + valid conditions
+    # page size per synonym, matching the old one-query-per-condition budget
+    per_term = limit * 3 if drug else limit * 5
+
+    def _search(query: str, n_terms: int) -> List[TrialHit]:
+        logger.info("ClinicalTrials.gov query → %s", query)
+        return client.search_studies(query, per_term * n_terms, raise_on_reject=True)
+
+    # CASE 1: drug + valid conditions → drug AND (c1 OR c2 OR …)
     if drug and clean_conditions:
-        for cond in clean_conditions:
-            query = f"{drug} AND {cond}"
-            logger.info("ClinicalTrials.gov query → %s", query)
-            for t in client.search_studies(query, limit * 3):
-                pool[t.nct_id] = t
+        batches = run_planned_search(
+            clean_conditions,
+            lambda conds: f"{drug} AND ({_or_block(conds)})",
+            _search,
+            client.MAX_TERM_LENGTH,
+        )
 
     # CASE 2: drug only
     elif drug:
         logger.info("ClinicalTrials.gov query → %s", drug)
-        for t in client.search_studies(drug, limit * 5):
-            pool[t.nct_id] = t
+        batches = [client.search_studies(drug, limit * 5)]
 
-    # CASE 3: conditions only
+    # CASE 3: conditions only → c1 OR c2 OR …
     elif clean_conditions:
-        for cond in clean_conditions:
-            logger.info("ClinicalTrials.gov query → %s", cond)
-            for t in client.search_studies(cond, limit * 5):
-                pool[t.nct_id] = t
+        batches = run_planned_search(
+            clean_conditions,
+            _or_block,
+            _search,
+            client.MAX_TERM_LENGTH,
+        )
+
+    else:
+        batches = []
+
+    for batch in batches:
+        for t in batch:
+            pool[t.nct_id] = t
 
     return list(pool.values())
 
@@ -115,6 +155,28 @@ def compute_signals(trials: List[TrialHit]) -> dict:
     }
 
 
+# ======================================================
+# EVIDENCE
+# ======================================================
+
+def collect_clinical_evidence(
+    drug: str,
+    conditions: List[str],
+    max_results: int = 5,
+) -> ClinicalEvidence:
+    trials = retrieve_trials(drug, conditions, max_results)
+
+    clean_conditions = [c.strip() for c in conditions if c and c.strip()]
+    evidence = ClinicalEvidence(drug=drug, conditions=clean_conditions)
+
+    if trials:
+        score_trials(trials)
+        evidence.trials = select_top_trials(trials, max_results)
+        evidence.signals = compute_signals(evidence.trials)
+
+    return evidence
+
+
 # ======================================================
 # ENDPOINT — PLAIN TEXT
 # ======================================================
@@ -123,60 +185,13 @@ def compute_signals(trials: List[TrialHit]) -> dict:
 def clinical_endpoint(req: ClinicalRequest):
 
     try:
-        trials = retrieve_trials(
+        evidence = collect_clinical_evidence(
             req.drug,
             req.conditions,
             req.max_results
         )
-
-        clean_conditions = [c.strip() for c in req.conditions if c and c.strip()]
-
-        if not trials:
-            text = (
-                "CLINICAL TRIAL SIGNALS\n"
-                f"Drug      : {req.drug}\n"
-                f"Conditions: {', '.join(clean_conditions) or 'N/A'}\n\n"
-                "No registered clinical trials found.\n"
-                "This suggests a lack of formal clinical investigation.\n"
-            )
-            return Response(content=text, media_type="text/plain")
-
-        for t in trials:
-            t.score = score_trial(t)
-
-        trials.sort(key=lambda x: x.score, reverse=True)
-        final_trials = trials[:req.max_results]
-
-        signals = compute_signals(final_trials)
-
-        lines = []
-        lines.append("CLINICAL TRIAL SIGNALS")
-        lines.append(f"Drug      : {req.drug}")
-        lines.append(f"Conditions: {', '.join(clean_conditions) or 'N/A'}\n")
-
-        lines.append(f"Total matching trials      : {signals['total_trials']}")
-        lines.append(f"Recruiting trials          : {signals['recruiting_trials']}")
-        lines.append(
-            f"Latest trial start year    : {signals['latest_start_year'] or 'N/A'}"
-        )
-        lines.append("Phase distribution:")
-        for p, c in signals["phase_distribution"].items():
-            lines.append(f"  - {p} : {c}")
-
-        lines.append("\nTOP CLINICAL TRIALS (by score)\n")
-
-        rank = 1
-        for t in final_trials:
-            lines.append(f"{rank}. {t.title}")
-            lines.append(f"   Phase    : {t.phase or 'UNKNOWN'}")
-            lines.append(f"   Status   : {t.status}")
-            lines.append(f"   Sponsor  : {t.sponsor}")
-            lines.append(f"   NCT ID   : {t.nct_id}")
-            lines.append(f"   URL      : {t.url}\n")
-            rank += 1
-
         return Response(
-            content="\n".join(lines),
+            content=evidence.render(),
             media_type="text/plain"
         )
 
@@ -2,8 +2,9 @@ from fastapi import APIRouter, Response, Depends
 from pydantic import BaseModel
 from typing import List
 
+from app.services.evidence import InternalEvidence, Passage
 from app.services.internal_knowledge_service import (
-    retrieve_candidate_documents,
+    search_passages,
 )
 from app.auth.dependencies import get_current_user
 from app.auth.schemas import AuthUser
@@ -22,86 +23,53 @@ class InternalKnowledgeRequest(BaseModel):
 
 
 # ======================================================
-# ENDPOINT — PLAIN TEXT
+# EVIDENCE
 # ======================================================
 
-@router.post("/internal-knowledge", tags=["internal_knowledge"])
-async def query_internal_knowledge(
-    req: InternalKnowledgeRequest,
-    current_user: AuthUser = Depends(get_current_user),
-):
-    drug = req.drug.strip()
-    conditions = [c.strip() for c in req.conditions if c.strip()]
-
-    if not drug and not conditions:
-        return Response(
-            content=(
-                "INTERNAL KNOWLEDGE SIGNALS\n\n"
-                "No drug or condition provided.\n"
-                "At least one must be specified."
-            ),
-            media_type="text/plain",
-        )
-
-    all_results = {}
-    query_pairs = []
+def collect_internal_evidence(
+    company_id: int,
+    drug: str,
+    conditions: List[str],
+) -> InternalEvidence:
 
-    if drug and conditions:
-        query_pairs = [(drug, c) for c in conditions]
-        mode = "DRUG_AND_CONDITION"
-    elif drug:
-        query_pairs = [(drug, None)]
-        mode = "DRUG_ONLY"
-    else:
-        query_pairs = [(None, c) for c in conditions]
-        mode = "CONDITION_ONLY"
+    drug = drug.strip()
+    conditions = [c.strip() for c in conditions if c.strip()]
+    evidence = InternalEvidence(drug=drug, conditions=conditions)
 
-    # 🔐 REAL COMPANY ID FROM AUTH
-    company_id = current_user.company_id
+    if not drug and not conditions:
+        return evidence
 
-    for d, c in query_pairs:
-        docs = retrieve_candidate_documents(
+    # conditions are synonyms of one indication → a single OR query
+    evidence.passages = [
+        Passage(**p)
+        for p in search_passages(
             company_id=company_id,
-            drug=d,
-            condition=c
+            drug=drug or None,
+            conditions=conditions,
         )
-        for doc in docs:
-            all_results[doc["document_id"]] = doc
+    ]
+    return evidence
 
-    if not all_results:
-        return Response(
-            content=(
-                "INTERNAL KNOWLEDGE SIGNALS\n\n"
-                f"Query mode : {mode}\n"
-                f"Drug       : {drug or 'N/A'}\n"
-                f"Conditions : {', '.join(conditions) or 'N/A'}\n\n"
-                "No internal knowledge records matched."
-            ),
-            media_type="text/plain",
-        )
 
-    # -----------------------------
-    # PLAIN TEXT OUTPUT
-    # -----------------------------
-
-    lines = []
-    lines.append("INTERNAL KNOWLEDGE SIGNALS\n")
-    lines.append(f"Query mode : {mode}")
-    lines.append(f"Drug       : {drug or 'N/A'}")
-    lines.append(f"Conditions : {', '.join(conditions) or 'N/A'}\n")
-    lines.append(f"Total internal records : {len(all_results)}\n")
-
-    for idx, doc in enumerate(all_results.values(), start=1):
-        excerpt = doc["raw_text"][:800].strip()
+# ======================================================
+# ENDPOINT — PLAIN TEXT
+# ======================================================
 
-        lines.append(f"{idx}. Document ID : {doc['document_id']}")
-        lines.append(f"   Type        : {doc['document_type']}")
-        lines.append(f"   Confidence  : {doc['confidence'].upper()}")
-        lines.append("   Excerpt:")
-        lines.append(excerpt)
-        lines.append("\n" + "-" * 100)
+@router.post("/internal-knowledge", tags=["internal_knowledge"])
+def query_internal_knowledge(
+    req: InternalKnowledgeRequest,
+    current_user: AuthUser = Depends(get_current_user),
+):
+    # plain def: storage sync, extraction and vector refresh block, so
+    # FastAPI runs this in its threadpool rather than on the event loop
+    # 🔐 REAL COMPANY ID FROM AUTH
+    evidence = collect_internal_evidence(
+        current_user.company_id,
+        req.drug,
+        req.conditions,
+    )
 
     return Response(
-        content="\n".join(lines),
+        content=evidence.render(),
         media_type="text/plain",
     )
@@ -1,6 +1,6 @@
 # app/agents/literature.py
 
-from typing import Optional, Dict, Any, List, Literal
+from typing import Optional, List, Literal
 import math
 import logging
 
@@ -16,6 +16,7 @@ from app.services.pubmed_literature import (
     infer_population_flag_from_mesh_and_text,
 )
 from app.services.icite_client import fetch_icite_metrics
+from app.services.evidence import LiteratureEvidence, Paper, query_mode
 
 logger = logging.getLogger("literature-agent")
 router = APIRouter()
@@ -89,33 +90,23 @@ def _compute_score(year, study_design, population_flag, citation_count, rcr) ->
     )
 
 # -------------------------------------------------
-# ROUTER ENDPOINT — PLAIN TEXT OUTPUT
+# EVIDENCE
 # -------------------------------------------------
 
-@router.post("/literature", tags=["literature"])
-def literature_endpoint(req: LiteratureRequest):
+def collect_literature_evidence(
+    drug: str,
+    conditions: List[str],
+    include_veterinary: bool = False,
+    max_results: int = 5,
+) -> LiteratureEvidence:
 
-    drug = req.drug.strip()
-    conditions = [c.strip() for c in req.conditions if c.strip()]
+    drug = drug.strip()
+    conditions = [c.strip() for c in conditions if c.strip()]
+    evidence = LiteratureEvidence(drug=drug, conditions=conditions)
 
-    # -----------------------------
-    # QUERY MODE RESOLUTION (FIXED)
-    # -----------------------------
-    if drug and conditions:
-        mode = "DRUG_AND_CONDITION"
-    elif drug:
-        mode = "DRUG_ONLY"
-    elif conditions:
-        mode = "CONDITION_ONLY"
-    else:
-        return Response(
-            content=(
-                "LITERATURE EVIDENCE (PUBMED)\n\n"
-                "No drug or condition provided.\n"
-                "At least one of drug or condition must be specified."
-            ),
-            media_type="text/plain",
-        )
+    mode = query_mode(drug, conditions)
+    if mode is None:
+        return evidence
 
     # -----------------------------
     # BUILD QUERY (FIXED)
@@ -126,86 +117,61 @@ def literature_endpoint(req: LiteratureRequest):
         mode=mode,
     )
 
-    pmids = search_pubmed_ids(query, retmax=req.max_results, sort="pub+date")
+    pmids = search_pubmed_ids(query, retmax=max_results, sort="pub+date")
 
     if not pmids:
-        return Response(
-            content=(
-                "LITERATURE EVIDENCE (PUBMED)\n\n"
-                f"Query mode : {mode}\n"
-                f"Drug       : {drug or 'N/A'}\n"
-                f"Conditions : {', '.join(conditions) or 'N/A'}\n\n"
-                "No relevant PubMed literature found where the query terms "
-                "appear in the title or abstract.\n"
-                "This suggests a lack of direct published evidence."
-            ),
-            media_type="text/plain",
-        )
+        return evidence
 
     summaries = fetch_pubmed_summaries(pmids)
     abstracts = fetch_pubmed_abstracts(pmids)
     mesh_terms = fetch_mesh_terms(pmids)
     icite = fetch_icite_metrics(pmids)
 
-    papers: List[Dict[str, Any]] = []
-
     for s in summaries:
         pmid = s["pmid"]
         abstract_text = abstracts.get(pmid, "")
         mesh = mesh_terms.get(pmid, [])
 
         population_flag = infer_population_flag_from_mesh_and_text(mesh, abstract_text)
-        if population_flag == "VETERINARY_ONLY" and not req.include_veterinary:
+        if population_flag == "VETERINARY_ONLY" and not include_veterinary:
             continue
 
+        study_design = _classify_study_design(s["article_types"])
         metrics = icite.get(pmid, {})
         score = _compute_score(
             s["publication_year"],
-            _classify_study_design(s["article_types"]),
+            study_design,
             population_flag,
             int(metrics.get("citation_count", 0)),
             float(metrics.get("relative_citation_ratio", 0.0)),
         )
 
-        papers.append({
-            "pmid": pmid,
-            "title": s["title"],
-            "journal": s["journal"],
-            "publication_year": s["publication_year"],
-            "study_design": _classify_study_design(s["article_types"]),
-            "population_flag": population_flag,
-            "abstract_snippet": abstract_text[:600],
-            "pubmed_url": f"https://pubmed.ncbi.nlm.nih.gov/{pmid}/",
-            "score": score,
-        })
+        evidence.papers.append(Paper(
+            pmid=pmid,
+            title=s["title"],
+            journal=s["journal"],
+            publication_year=s["publication_year"],
+            study_design=study_design,
+            population_flag=population_flag,
+            abstract_snippet=abstract_text[:600],
+            pubmed_url=f"https://pubmed.ncbi.nlm.nih.gov/{pmid}/",
+            score=score,
+        ))
 
-    papers.sort(key=lambda p: (p["score"], p.get("publication_year") or 0), reverse=True)
+    evidence.papers.sort(key=lambda p: (p.score, p.publication_year or 0), reverse=True)
+    return evidence
 
-    # -----------------------------
-    # PLAIN TEXT RESPONSE
-    # -----------------------------
 
-    lines = [
-        "LITERATURE EVIDENCE (PUBMED)\n",
-        f"Query mode : {mode}",
-        f"Drug       : {drug or 'N/A'}",
-        f"Conditions : {', '.join(conditions) or 'N/A'}\n",
-        f"Total relevant papers : {len(papers)}\n",
-        "TOP PUBMED EVIDENCE\n",
-    ]
-
-    for idx, p in enumerate(papers, start=1):
-        lines.extend([
-            f"{idx}. {p['title']}",
-            f"   Journal     : {p['journal']}",
-            f"   Year        : {p['publication_year'] or 'N/A'}",
-            f"   Study type  : {p['study_design']}",
-            f"   Population  : {p['population_flag']}",
-            f"   PMID        : {p['pmid']}",
-            f"   URL         : {p['pubmed_url']}\n",
-            "   Abstract:",
-            p["abstract_snippet"] or "   Abstract not available.",
-            "\n" + "-" * 100,
-        ])
-
-    return Response("\n".join(lines), media_type="text/plain")
+# -------------------------------------------------
+# ROUTER ENDPOINT — PLAIN TEXT OUTPUT
+# -------------------------------------------------
+
+@router.post("/literature", tags=["literature"])
+def literature_endpoint(req: LiteratureRequest):
+    evidence = collect_literature_evidence(
+        req.drug,
+        req.conditions,
+        include_veterinary=req.include_veterinary,
+        max_results=req.max_results,
+    )
+    return Response(evidence.render(), media_type="text/plain")
@@ -1,31 +1,41 @@
 # app/agents/orchestration.py
 
-from fastapi import APIRouter, Response, Request, Depends
+from fastapi import APIRouter, Response, Depends
 from pydantic import BaseModel, Field
-from typing import List, Dict
-import httpx
+from typing import Awaitable, Callable, List, Dict
+import asyncio
 import logging
 
-from app.config import settings
 from app.auth.dependencies import get_current_user
 from app.auth.schemas import AuthUser
+from app.agents.clinical import collect_clinical_evidence
+from app.agents.internal_knowledge import collect_internal_evidence
+from app.agents.literature import collect_literature_evidence
+from app.agents.market_agent import collect_market_evidence
+from app.agents.patents import collect_patent_evidence
+from app.agents.web_intelligence import collect_web_evidence
+from app.services.evidence import AgentFailure, Evidence, EvidenceBundle
 
 logger = logging.getLogger("orchestration")
 router = APIRouter()
 
-# 🌍 Read from ENV (deployment-safe)
-BASE_URL = settings.PUBLIC_API_URL.rstrip("/")
-
 # --------------------------------------------------
-# AGENT ENDPOINTS (LOCKED)
+# AGENT COLLECTORS (IN-PROCESS, TYPED EVIDENCE)
 # --------------------------------------------------
-AGENT_ENDPOINTS = {
-    "clinical": "/api/clinical",
-    "literature": "/api/literature",
-    "patents": "/api/patents",
-    "market": "/api/market",
-    "web": "/api/web_intelligence",
-    "internal": "/api/internal-knowledge",
+# (drug, conditions, company_id) → evidence; blocking agents run in a thread
+
+# per-agent deadline (the HTTP fan-out used a 90 s client timeout)
+AGENT_TIMEOUT_SECONDS = 90
+
+Collector = Callable[[str, List[str], int], Awaitable[Evidence]]
+
+AGENT_COLLECTORS: Dict[str, Collector] = {
+    "clinical": lambda d, c, _: asyncio.to_thread(collect_clinical_evidence, d, c),
+    "literature": lambda d, c, _: asyncio.to_thread(collect_literature_evidence, d, c),
+    "patents": lambda d, c, _: collect_patent_evidence(d or None, c),
+    "market": lambda d, c, _: asyncio.to_thread(collect_market_evidence, d, c),
+    "web": lambda d, c, _: collect_web_evidence(d, c),
+    "internal": lambda d, c, company: asyncio.to_thread(collect_internal_evidence, company, d, c),
 }
 
 # --------------------------------------------------
@@ -55,19 +65,45 @@ class OrchestrationRequest(BaseModel):
 
 
 # --------------------------------------------------
-# EVIDENCE BUNDLE BUILDER
+# EVIDENCE COLLECTION
 # --------------------------------------------------
-def build_evidence_bundle(agent_outputs: Dict[str, str]) -> str:
-    parts: List[str] = []
-    parts.append("=== EVIDENCE BUNDLE START ===\n\n")
+async def collect_evidence(
+    drug: str,
+    conditions: List[str],
+    intent: str,
+    company_id: int,
+) -> EvidenceBundle:
+    """
+    Input  : drug, condition synonyms, resolved intent, caller's company
+    Output : typed evidence per agent of the intent, in map order
+    """
+    agents = INTENT_AGENT_MAP[intent]
+    logger.info("Orchestration started | intent=%s | agents=%s", intent, agents)
+
+    results = await asyncio.gather(
+        *(
+            asyncio.wait_for(
+                AGENT_COLLECTORS[agent](drug, conditions, company_id),
+                AGENT_TIMEOUT_SECONDS,
+            )
+            for agent in agents
+        ),
+        return_exceptions=True,
+    )
 
-    for agent, text in agent_outputs.items():
-        parts.append(f"[AGENT: {agent.upper()}]\n")
-        parts.append(text.strip())
-        parts.append("\n\n")
+    bundle = EvidenceBundle(drug=drug, conditions=conditions, intent=intent)
+    for agent, result in zip(agents, results):
+        if isinstance(result, asyncio.TimeoutError):
+            logger.error("Agent %s timed out after %ss", agent, AGENT_TIMEOUT_SECONDS)
+            bundle.items[agent] = AgentFailure(agent)
+        elif isinstance(result, BaseException):
+            logger.error("Agent %s failed | %r", agent, result)
+            bundle.items[agent] = AgentFailure(agent)
+        else:
+            bundle.items[agent] = result
 
-    parts.append("=== EVIDENCE BUNDLE END ===")
-    return "".join(parts)
+    logger.info("Orchestration completed successfully")
+    return bundle
 
 
 # --------------------------------------------------
@@ -76,7 +112,6 @@ def build_evidence_bundle(agent_outputs: Dict[str, str]) -> str:
 @router.post("/orchestrate")
 async def orchestrate(
     req: OrchestrationRequest,
-    request: Request,
     current_user: AuthUser = Depends(get_current_user),  # 🔐 REQUIRE AUTH
 ):
     intent = req.intent.upper()
@@ -89,43 +124,9 @@ async def orchestrate(
             status_code=400,
         )
 
-    agents_to_call = INTENT_AGENT_MAP[intent]
-    logger.info("Orchestration started | intent=%s | agents=%s", intent, agents_to_call)
-
-    payload = {
-        "drug": req.drug,
-        "conditions": req.conditions,
-    }
-
-    # 🔐 Forward Authorization header
-    auth_header = request.headers.get("Authorization")
-    headers = {}
-    if auth_header:
-        headers["Authorization"] = auth_header
-
-    agent_outputs: Dict[str, str] = {}
-
-    async with httpx.AsyncClient(timeout=90) as client:
-        for agent in agents_to_call:
-            logger.info("Calling agent: %s", agent)
-
-            resp = await client.post(
-                f"{BASE_URL}{AGENT_ENDPOINTS[agent]}",
-                json=payload,
-                headers=headers,
-            )
-
-            if resp.status_code != 200:
-                logger.error("Agent %s failed | status=%s", agent, resp.status_code)
-                agent_outputs[agent] = "ERROR: Agent call failed."
-            else:
-                agent_outputs[agent] = resp.text
-
-    evidence_text = build_evidence_bundle(agent_outputs)
-
-    logger.info("Orchestration completed successfully")
+    bundle = await collect_evidence(req.drug, req.conditions, intent, current_user.company_id)
 
     return Response(
-        content=evidence_text,
+        content=bundle.render(),
         media_type="text/plain",
     )
@@ -2,7 +2,8 @@ from typing import List, Optional
 from fastapi import APIRouter, Response
 from pydantic import BaseModel, Field
 
-from app.services.patent_service import search_patents_raw_xml
+from app.services.evidence import PatentEvidence
+from app.services.patent_providers import get_patent_provider
 
 router = APIRouter()
 
@@ -10,9 +11,19 @@ router = APIRouter()
 class PatentsRequest(BaseModel):
     drug: Optional[str] = Field(None, description="INN drug name")
     conditions: List[str] = Field(default_factory=list, max_items=3)
+    deep_scan: bool = Field(False, description="Page beyond the first OPS result range (OPS provider only)")
+
+
+async def collect_patent_evidence(
+    drug: Optional[str],
+    conditions: List[str],
+    deep_scan: bool = False,
+) -> PatentEvidence:
+    records = await get_patent_provider().search(drug, conditions, deep_scan)
+    return PatentEvidence(drug=drug, conditions=conditions, patents=records)
 
 
 @router.post("/patents")
-def patents_agent(req: PatentsRequest):
-    text = search_patents_raw_xml(req.drug, req.conditions)
-    return Response(content=text, media_type="text/plain")
+async def patents_agent(req: PatentsRequest):
+    evidence = await collect_patent_evidence(req.drug, req.conditions, req.deep_scan)
+    return Response(content=evidence.render(), media_type="text/plain")
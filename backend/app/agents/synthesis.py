@@ -8,7 +8,6 @@ from typing import List, Optional, Dict, Any
 import asyncio
 import json  
 
-import httpx
 import logging
 import time
 
@@ -22,14 +21,12 @@ from app.pre_synthesis.groq_interpreter import interpret_query
 from app.llm.groq_synthesis import run_groq
 from app.models.chat import ChatHistory  # ← New import
 from app.db import SessionLocal  # ← New import
-from app.config import settings
+from app.agents.orchestration import collect_evidence
+from app.services.visualization_builder import bundle_visualizations
 
 logger = logging.getLogger("synthesis")
 router = APIRouter()
 
-BASE_URL = settings.PUBLIC_API_URL.rstrip("/")
-
-
 # ======================================================
 # GENERAL CHAT PROMPT (MINIMAL)
 # ======================================================
@@ -393,28 +390,17 @@ async def synthesize(
     evidence_cache = state.get("evidence_cache", {})
     condition_key = "|".join(sorted(active_conditions))
 
-    async with httpx.AsyncClient(timeout=120) as client:
-        for drug in active_drugs:
-            cache_key = f"{drug}|{condition_key}|{resolved_intent}"
-
-            if cache_key not in evidence_cache:
-                auth_header = request.headers.get("Authorization")
-                headers = {}
-                if auth_header:
-                    headers["Authorization"] = auth_header
-
-                resp = await client.post(
-                    f"{BASE_URL}/api/orchestrate",
-                    json={
-                        "drug": drug,
-                        "conditions": active_conditions,
-                        "intent": resolved_intent,
-                    },
-                    headers=headers,
-                )
+    # typed bundles are cached; text is rendered only for the prompt
+    for drug in active_drugs:
+        cache_key = f"{drug}|{condition_key}|{resolved_intent}"
 
-                resp.raise_for_status()
-                evidence_cache[cache_key] = resp.text
+        if cache_key not in evidence_cache:
+            evidence_cache[cache_key] = await collect_evidence(
+                drug,
+                active_conditions,
+                resolved_intent,
+                current_user.company_id,
+            )
 
 
     update_conversation(cid, evidence_cache=evidence_cache)
@@ -425,13 +411,13 @@ async def synthesize(
     if mode == "SINGLE":
         drug_label = active_drugs[0] if active_drugs else "NONE"
         cache_key = f"{drug_label}|{condition_key}|{resolved_intent}"
-        full_evidence = evidence_cache.get(cache_key, "")
+        bundle = evidence_cache.get(cache_key)
 
         prompt = SYSTEM_IDENTITY.format(
             drug=drug_label,
             condition=", ".join(active_conditions),
             intent=resolved_intent,
-            evidence=full_evidence,
+            evidence=bundle.render() if bundle else "",
         )
 
         full_prompt = f"USER QUESTION: {message}\n\n{prompt}"
@@ -442,9 +428,9 @@ async def synthesize(
         blocks = []
         for drug in active_drugs:
             cache_key = f"{drug}|{condition_key}|{resolved_intent}"
-            ev = evidence_cache.get(cache_key, "")
+            ev = evidence_cache.get(cache_key)
             if ev:
-                blocks.append(f"[{drug.upper()}]\n" + ev)
+                blocks.append(f"[{drug.upper()}]\n" + ev.render())
 
         prompt = COMPARISON_PROMPT.format(
             condition=", ".join(active_conditions),
@@ -461,38 +447,12 @@ async def synthesize(
     visualizations: Optional[Dict[str, Any]] = None
 
     # Only trigger visualization for SINGLE mode (clean, no confusion)
-    if mode == "SINGLE" and resolved_intent in ["COMMERCIAL", "FULL_OPPORTUNITY"]:
-        market_text = ""
-        clinical_text = ""
-
-        # Extract from single drug evidence
-        if "[AGENT: MARKET]" in full_evidence:
-            parts = full_evidence.split("[AGENT: MARKET]")
-            if len(parts) > 1:
-                market_text = parts[1].split("[AGENT:")[0].strip()
-
-        if "[AGENT: CLINICAL]" in full_evidence:
-            parts = full_evidence.split("[AGENT: CLINICAL]")
-            if len(parts) > 1:
-                clinical_text = parts[1].split("[AGENT:")[0].strip()
-
-        if market_text or clinical_text:
-            try:
-                async with httpx.AsyncClient() as viz_client:
-                    viz_resp = await viz_client.post(
-                        f"{BASE_URL}/api/visualize",
-                        json={
-                            "market_data": market_text,
-                            "clinical_data": clinical_text,
-                        },
-                        timeout=30.0
-                    )
-                    if viz_resp.status_code == 200:
-                        visualizations = viz_resp.json()
-                    else:
-                        logger.warning(f"Visualization failed: {viz_resp.status_code}")
-            except Exception as e:
-                logger.error(f"Visualization error: {e}")
+    # Built in-process from the cached evidence and cached with it
+    if mode == "SINGLE" and resolved_intent in ["COMMERCIAL", "FULL_OPPORTUNITY"] and bundle:
+        try:
+            visualizations = bundle_visualizations(bundle)
+        except Exception as e:
+            logger.error(f"Visualization error: {e}")
 
     # -----------------------------
     # SAVE CHAT HISTORY TO DATABASE WITH USER_ID
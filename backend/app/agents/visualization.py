@@ -1,11 +1,19 @@
 # app/agents/visualization.py
 
 from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, Dict, Any, List
 import logging
 import re
-from datetime import datetime
+
+from app.services.evidence import MarketEvidence, MarketFigures
+from app.services.market_mock import lookup_pairs
+from app.agents.market_agent import collect_market_evidence
+from app.services.visualization_builder import (
+    build_clinical_block,
+    build_market_bands,
+    build_market_block,
+)
 
 logger = logging.getLogger("visualization")
 router = APIRouter()
@@ -24,6 +32,15 @@ class VisualizationResponse(BaseModel):
     clinical: Optional[Dict[str, Any]] = None
 
 
+class ForecastPair(BaseModel):
+    drug: str = ""
+    condition: str = ""
+
+
+class ForecastRequest(BaseModel):
+    pairs: List[ForecastPair] = Field(min_items=1, max_items=500)
+
+
 # ======================================================
 # GENERIC HELPERS
 # ======================================================
@@ -39,27 +56,8 @@ def extract_float(pattern: str, text: str) -> Optional[float]:
         return None
 
 
-def generate_market_timeline(
-    start_value: float,
-    cagr: float,
-    start_year: int,
-    end_year: int,
-    target_2030: Optional[float] = None
-) -> List[Dict[str, float]]:
-    timeline = []
-    current = start_value
-    for year in range(start_year, end_year + 1):
-        if year == 2030 and target_2030 is not None:
-            value = target_2030
-        else:
-            value = round(current, 2)
-        timeline.append({"year": year, "value": value})
-        current *= (1 + cagr / 100)
-    return timeline
-
-
 # ======================================================
-# MARKET PARSER — FIXED
+# MARKET PARSER (LEGACY TEXT INPUT)
 # ======================================================
 
 def parse_market(text: str) -> Optional[Dict[str, Any]]:
@@ -73,47 +71,17 @@ def parse_market(text: str) -> Optional[Dict[str, Any]]:
     population = extract_float(r"patient population.*?([\d\.]+)", text)
     treated_pct = extract_float(r"treated population.*?([\d\.]+)", text)
 
-    if not current:
-        return None
-
-    year_now = datetime.now().year
-    end_year = 2030
-
-    # Force timeline to end at exact forecast if available
-    target_2030 = forecast
-
-    base = generate_market_timeline(current, cagr or 0, year_now, end_year, target_2030=target_2030)
-
-    # Bands ±2%
-    upper = generate_market_timeline(current, (cagr or 0) + 2, year_now, end_year, target_2030=target_2030 * 1.1 if target_2030 else None)
-    lower = generate_market_timeline(current, max((cagr or 0) - 2, 0), year_now, end_year, target_2030=target_2030 * 0.9 if target_2030 else None)
-
-    market_block: Dict[str, Any] = {
-        "current_usd_bn": current,
-        "forecast_2030_usd_bn": target_2030 or round(base[-1]["value"], 2),
-        "cagr_percent": cagr or 0,
-        "timeline": base,
-        "bands": {
-            "upper": upper,
-            "lower": lower
-        }
-    }
-
-    if population is not None and treated_pct is not None:
-        treated_pop = round(population * treated_pct / 100, 2)
-        untreated_pop = round(population - treated_pop, 2)
-        market_block["patient_split"] = {
-            "total_population_m": population,
-            "treated_population_m": treated_pop,
-            "untreated_population_m": untreated_pop,
-            "treated_percent": treated_pct
-        }
-
-    return market_block
+    return build_market_block(MarketFigures(
+        current_usd_bn=current,
+        forecast_2030_usd_bn=forecast,
+        cagr_percent=cagr,
+        patient_population_m=population,
+        treated_percent=treated_pct,
+    ))
 
 
 # ======================================================
-# CLINICAL PARSER — ALREADY ROBUST (keep your fixed version)
+# CLINICAL PARSER (LEGACY TEXT INPUT)
 # ======================================================
 
 def parse_clinical(text: str) -> Optional[Dict[str, Any]]:
@@ -128,39 +96,23 @@ def parse_clinical(text: str) -> Optional[Dict[str, Any]]:
     ]):
         return None
 
-    phase_counts = {
-        "PHASE1": 0,
-        "PHASE2": 0,
-        "PHASE3": 0,
-        "PHASE4": 0,
-        "OTHER": 0
-    }
+    phase_counts: Dict[str, int] = {}
 
     pattern = re.compile(r"PHASE\s*(\d)\s*[:\-]?\s*(\d+)", re.IGNORECASE)
 
     for line in text.splitlines():
         match = pattern.search(line)
         if match:
-            phase_num = f"PHASE{match.group(1)}"
-            count = int(match.group(2))
-            if phase_num in phase_counts:
-                phase_counts[phase_num] = count
-            else:
-                phase_counts["OTHER"] += count
-
-    total = sum(phase_counts.values())
-    if total == 0:
-        return None
+            phase_counts[f"PHASE{match.group(1)}"] = int(match.group(2))
 
-    return {
-        "total_trials": total,
-        "by_phase": phase_counts
-    }
+    return build_clinical_block({"phase_distribution": phase_counts})
 
 
 # ======================================================
 # ENDPOINT
 # ======================================================
+# for external text callers; synthesis builds charts in-process from
+# typed evidence (app/services/visualization_builder.py)
 
 @router.post("/visualize", response_model=VisualizationResponse)
 def visualize(req: VisualizationRequest):
@@ -178,4 +130,35 @@ def visualize(req: VisualizationRequest):
 
     except Exception:
         logger.exception("Visualization agent failed")
-        raise HTTPException(status_code=500, detail="Visualization agent failed internally")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Visualization agent failed internally")
+
+
+# ======================================================
+# BATCH FORECAST BANDS
+# ======================================================
+
+@router.post("/visualize/forecast")
+def forecast_bands(req: ForecastRequest):
+    """Monte Carlo bands for many drug/condition pairs in one simulation."""
+    # exact pairs in one columnar pass; only misses go through fuzzy matching
+    rows = lookup_pairs([(p.drug, p.condition) for p in req.pairs])
+    evidence = [
+        MarketEvidence.from_row(p.drug, [p.condition], row, row["condition"], 1.0)
+        if row is not None
+        else collect_market_evidence(p.drug, [p.condition] if p.condition else [])
+        for p, row in zip(req.pairs, rows)
+    ]
+    matched = [e for e in evidence if e.figures is not None]
+    bands = iter(build_market_bands([e.figures for e in matched]))
+
+    return {
+        "results": [
+            {
+                "drug": p.drug,
+                "condition": p.condition,
+                "matched_condition": e.condition,
+                "bands": next(bands) if e.figures is not None else None,
+            }
+            for p, e in zip(req.pairs, evidence)
+        ]
+    }
@@ -4,57 +4,42 @@ from typing import List, Dict, Any
 from fastapi import APIRouter, Response
 from pydantic import BaseModel, Field
 from urllib.parse import urlparse
-import time
+import asyncio
+import logging
 
 from ddgs import DDGS  # pip install ddgs
 
+from app.config import settings
+from app.services.near_duplicates import SimHashIndex
+from app.services.domain_classifier import is_mostly_ascii, load_domain_classifier
+from app.services.evidence import WebEvidence, WebSignal
+from app.services.rate_limiter import AsyncRateLimiter
+from app.services.ttl_cache import SQLiteTTLCache
+
+logger = logging.getLogger("web-intelligence")
 router = APIRouter()
 
 # ======================================================
 # DOMAIN CLASSIFICATION (TYPE-BASED, NO TIERS)
 # ======================================================
 
-DOMAIN_SIGNAL_MAP = {
-    # Regulatory / guidelines
-    "fda.gov": "REGULATORY",
-    "ema.europa.eu": "REGULATORY",
-    "who.int": "REGULATORY",
-
-    # Scholarly / journals
-    "nih.gov": "SCHOLARLY",
-    "ncbi.nlm.nih.gov": "SCHOLARLY",
-    "pubmed.ncbi.nlm.nih.gov": "SCHOLARLY",
-    "nejm.org": "SCHOLARLY",
-    "thelancet.com": "SCHOLARLY",
-    "bmj.com": "SCHOLARLY",
-    "nature.com": "SCHOLARLY",
-    "science.org": "SCHOLARLY",
-    "sciencedirect.com": "SCHOLARLY",
-    "wiley.com": "SCHOLARLY",
-    "springer.com": "SCHOLARLY",
-    "frontiersin.org": "SCHOLARLY",
-
-    # Preprints / pipeline
-    "clinicaltrials.gov": "PIPELINE",
-    "medrxiv.org": "PIPELINE",
-    "biorxiv.org": "PIPELINE",
-
-    # Industry / news
-    "reuters.com": "NEWS",
-    "statnews.com": "NEWS",
-    "endpts.com": "NEWS",
-    "fiercepharma.com": "NEWS",
-    "fiercebiotech.com": "NEWS",
-    "biopharmadive.com": "NEWS",
-    "pharmaphorum.com": "NEWS",
-}
-
-BLOCKED_KEYWORDS = {
-    "forum", "reddit", "facebook", "twitter", "x.com",
-    "patient", "donation", "support", "blog", "community"
-}
-
-REQUEST_SLEEP_SECONDS = 1.0
+# signal map + blocked keywords live in a domain list file
+# (app/resources/web_domains.json unless WEB_DOMAIN_LIST_PATH is set)
+_CLASSIFIER = load_domain_classifier(settings.WEB_DOMAIN_LIST_PATH or None)
+
+# DuckDuckGo pacing, shared by every request in the process
+DDGS_RATE_PER_SECOND = 1.0
+DDGS_BURST = 3
+DDGS_RESULTS_PER_QUERY = 10
+
+_DDGS_LIMITER = AsyncRateLimiter(DDGS_RATE_PER_SECOND, burst=DDGS_BURST)
+
+# raw DDGS results per query variant (pre-filtering), persisted across restarts
+_RESULT_CACHE = SQLiteTTLCache(
+    settings.CACHE_DB_PATH,
+    table="web_search_results",
+    ttl_seconds=settings.WEB_SEARCH_CACHE_TTL_SECONDS,
+)
 
 # ======================================================
 # REQUEST MODEL (LOCKED CONTRACT)
@@ -76,20 +61,13 @@ def _extract_domain(url: str) -> str:
         return ""
 
 def _is_blocked(url: str) -> bool:
-    u = url.lower()
-    return any(b in u for b in BLOCKED_KEYWORDS)
+    return _CLASSIFIER.is_blocked(url)
 
 def _is_english(text: str) -> bool:
-    if not text:
-        return False
-    non_ascii = sum(1 for c in text if ord(c) > 127)
-    return non_ascii / max(len(text), 1) < 0.05
+    return is_mostly_ascii(text)
 
 def _classify_signal(domain: str) -> str:
-    for d, t in DOMAIN_SIGNAL_MAP.items():
-        if domain.endswith(d):
-            return t
-    return "UNKNOWN"
+    return _CLASSIFIER.classify(domain)
 
 def _confidence_from_type(signal_type: str) -> str:
     if signal_type in {"REGULATORY", "SCHOLARLY"}:
@@ -123,16 +101,88 @@ def build_query_variants(drug: str, condition: str) -> List[str]:
     return list(dict.fromkeys(variants))
 
 # ======================================================
-# CORE SEARCH
+# CORE SEARCH (ASYNC, RATE-LIMITED, EARLY EXIT)
 # ======================================================
 
-def search_web(
+def _ddgs_text(query: str) -> List[Dict[str, Any]]:
+    with DDGS() as ddg:
+        return ddg.text(
+            query,
+            max_results=DDGS_RESULTS_PER_QUERY,
+            safesearch="moderate",
+            region="wt-wt"
+        ) or []
+
+
+def _cache_key(query: str) -> str:
+    return f"ddgs|wt-wt|moderate|{DDGS_RESULTS_PER_QUERY}|{query}"
+
+
+def _cache_get(query: str) -> List[Dict[str, Any]] | None:
+    try:
+        return _RESULT_CACHE.get(_cache_key(query))
+    except Exception:
+        logger.warning("Web search cache read failed", exc_info=True)
+        return None
+
+
+def _cache_set(query: str, results: List[Dict[str, Any]]) -> None:
+    try:
+        _RESULT_CACHE.set(_cache_key(query), results)
+    except Exception:
+        logger.warning("Web search cache write failed", exc_info=True)
+
+
+async def _run_query(query: str) -> List[Dict[str, Any]]:
+    cached = await asyncio.to_thread(_cache_get, query)
+    if cached is not None:
+        return cached
+
+    await _DDGS_LIMITER.acquire()
+    try:
+        # DDGS is blocking → keep it off the event loop
+        results = await asyncio.to_thread(_ddgs_text, query)
+    except Exception:
+        logger.warning("DDGS query failed → %s", query, exc_info=True)
+        return []
+
+    await asyncio.to_thread(_cache_set, query, results)
+    return results
+
+
+def _to_signal(r: Dict[str, Any]) -> WebSignal | None:
+    url = r.get("href") or ""
+    title = r.get("title") or ""
+    snippet = r.get("body") or ""
+
+    if not url or _is_blocked(url):
+        return None
+
+    if not _is_english(title + " " + snippet):
+        return None
+
+    domain = _extract_domain(url)
+    signal_type = _classify_signal(domain)
+
+    return WebSignal(
+        title=title.strip(),
+        snippet=snippet.strip(),
+        source_domain=domain,
+        url=url,
+        signal_type=signal_type,
+        confidence=_confidence_from_type(signal_type),
+    )
+
+
+async def search_web(
     drug: str,
     conditions: List[str],
     max_results: int
-) -> List[Dict[str, Any]]:
+) -> List[WebSignal]:
 
-    collected: Dict[str, Dict[str, Any]] = {}
+    collected: Dict[str, WebSignal] = {}
+    # syndicated stories reappear under new URLs → dedupe on title + snippet too
+    near_dupes = SimHashIndex()
 
     # resolve pairs (MATCHES CLINICAL + LITERATURE LOGIC)
     if drug and conditions:
@@ -144,110 +194,71 @@ def search_web(
     else:
         return []
 
-    with DDGS() as ddg:
-        for drug_term, condition_term in pairs:
-            queries = build_query_variants(drug_term, condition_term)
+    queries = list(dict.fromkeys(
+        q for drug_term, condition_term in pairs
+        for q in build_query_variants(drug_term, condition_term)
+    ))
 
-            for q in queries:
-                time.sleep(REQUEST_SLEEP_SECONDS)
+    # all variants in flight at once; the shared limiter paces the provider
+    tasks = [asyncio.create_task(_run_query(q)) for q in queries]
 
-                results = ddg.text(
-                    q,
-                    max_results=10,
-                    safesearch="moderate",
-                    region="wt-wt"
-                )
-
-                for r in results:
-                    url = r.get("href") or ""
-                    title = r.get("title") or ""
-                    snippet = r.get("body") or ""
-
-                    if not url or _is_blocked(url):
-                        continue
-
-                    if not _is_english(title + " " + snippet):
-                        continue
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            for r in await next_done:
+                url = r.get("href") or ""
+                if url in collected:
+                    continue
 
-                    if url in collected:
-                        continue
+                signal = _to_signal(r)
+                if signal is None:
+                    continue
 
-                    domain = _extract_domain(url)
-                    signal_type = _classify_signal(domain)
+                if not near_dupes.add(f"{signal.title} {signal.snippet}"):
+                    continue
 
-                    collected[url] = {
-                        "title": title.strip(),
-                        "snippet": snippet.strip(),
-                        "source_domain": domain,
-                        "url": url,
-                        "signal_type": signal_type,
-                        "confidence": _confidence_from_type(signal_type),
-                    }
+                collected[url] = signal
 
-                    if len(collected) >= max_results:
-                        return list(collected.values())
+                if len(collected) >= max_results:
+                    return list(collected.values())
+    finally:
+        # enough unique URLs (or error) → drop queries still waiting for a slot
+        for t in tasks:
+            t.cancel()
 
     return list(collected.values())
 
 # ======================================================
-# ENDPOINT — PLAIN TEXT OUTPUT
+# EVIDENCE
 # ======================================================
 
-@router.post("/web_intelligence", tags=["web"])
-def web_intelligence_endpoint(req: WebIntelligenceRequest):
-
-    drug = req.drug.strip()
-    conditions = [c.strip() for c in req.conditions if c.strip()]
-
-    if not drug and not conditions:
-        return Response(
-            content=(
-                "WEB INTELLIGENCE SIGNALS\n\n"
-                "No drug or condition provided.\n"
-                "At least one of drug or condition must be specified."
-            ),
-            media_type="text/plain",
+async def collect_web_evidence(
+    drug: str,
+    conditions: List[str],
+    max_results: int = 5,
+) -> WebEvidence:
+
+    drug = drug.strip()
+    conditions = [c.strip() for c in conditions if c.strip()]
+    evidence = WebEvidence(drug=drug, conditions=conditions)
+
+    if drug or conditions:
+        evidence.signals = await search_web(
+            drug=drug,
+            conditions=conditions,
+            max_results=max_results
         )
 
-    signals = search_web(
-        drug=drug,
-        conditions=conditions,
-        max_results=req.max_results
-    )
-
-    lines: List[str] = []
+    return evidence
 
-    lines.append("WEB INTELLIGENCE SIGNALS\n")
-    lines.append(f"Drug       : {drug or 'N/A'}")
-    lines.append(
-        f"Conditions : {', '.join(conditions) if conditions else 'N/A'}\n"
-    )
-    lines.append(f"Total signals found : {len(signals)}\n")
 
-    if not signals:
-        lines.append(
-            "No relevant web intelligence signals were found.\n"
-            "Signals are non-clinical and absence does not imply lack of evidence."
-        )
-        return Response(content="\n".join(lines), media_type="text/plain")
-
-    for idx, s in enumerate(signals, start=1):
-        lines.append(f"{idx}. {s['title']}")
-        lines.append(f"   Source     : {s['source_domain']}")
-        lines.append(f"   Type       : {s['signal_type']}")
-        lines.append(f"   Confidence : {s['confidence']}")
-        lines.append(f"   URL        : {s['url']}\n")
-        lines.append("   Snippet:")
-        lines.append(s["snippet"] or "   Snippet not available.")
-        lines.append("\n" + "-" * 100)
-
-    lines.append(
-        "\nNOTE:\n"
-        "Web intelligence signals are non-validated, non-clinical, English-only, "
-        "and contextual. They must not be treated as evidence. But only as sign of interest."
-    )
+# ======================================================
+# ENDPOINT — PLAIN TEXT OUTPUT
+# ======================================================
 
+@router.post("/web_intelligence", tags=["web"])
+async def web_intelligence_endpoint(req: WebIntelligenceRequest):
+    evidence = await collect_web_evidence(req.drug, req.conditions, req.max_results)
     return Response(
-        content="\n".join(lines),
+        content=evidence.render(),
         media_type="text/plain",
-    )
\ No newline at end of file
+    )
@@ -1,17 +1,82 @@
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
-from uuid import uuid4
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+from typing import Optional
+
+from fastapi import APIRouter, BackgroundTasks, Depends, UploadFile, File, HTTPException
 from sqlalchemy.orm import Session
 
 from app.auth.dependencies import get_current_user
 from app.auth.schemas import AuthUser
+from app.config import settings
 from app.db import get_db
-from app.services.supabase_client import supabase
+from app.services.document_index import DOCUMENT_INDEX
+from app.services.document_storage import get_document_storage
+from app.services.index_jobs import DONE, FAILED, INDEX_JOBS, QUEUED, run_index_job
+
+logger = logging.getLogger("documents")
 
 router = APIRouter(prefix="/documents", tags=["documents"])
 
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+EXTENSIONS = {
+    "application/pdf": "pdf",
+    "text/plain": "txt",
+}
+
+
+def _discard(path: str) -> None:
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+def _find_duplicate(company_id: int, sha256: str) -> Optional[dict]:
+    existing = INDEX_JOBS.find_upload(company_id, sha256)
+    # indexed once, but removed from storage (and the index) since
+    if (
+        existing
+        and existing["status"] == DONE
+        and not DOCUMENT_INDEX.has_document(company_id, existing["document_id"])
+    ):
+        return None
+    return existing
+
+
+async def _spool(file: UploadFile) -> tuple[str, str, int]:
+    """
+    Stream the upload to a temp file in chunks, hashing as it goes.
+    Output : (temp path, sha256 hex, size); 413 past MAX_UPLOAD_BYTES
+    """
+    digest = hashlib.sha256()
+    size = 0
+
+    fd, tmp_path = tempfile.mkstemp(prefix="upload-", dir=settings.UPLOAD_TMP_DIR or None)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+                size += len(chunk)
+                if size > settings.MAX_UPLOAD_BYTES:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"File exceeds {settings.MAX_UPLOAD_BYTES} bytes",
+                    )
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        _discard(tmp_path)
+        raise
+
+    return tmp_path, digest.hexdigest(), size
+
 
 @router.post("/upload")
 async def upload_document(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     current_user: AuthUser = Depends(get_current_user),
     db: Session = Depends(get_db),
@@ -20,26 +85,70 @@ async def upload_document(
         raise HTTPException(status_code=403, detail="Admin only")
 
     # backend safety
-    if file.content_type not in ["application/pdf", "text/plain"]:
+    if file.content_type not in EXTENSIONS:
         raise HTTPException(status_code=400, detail="Only PDF and TXT allowed")
 
     company_id = current_user.company_id
-    ext = file.filename.split(".")[-1]
-    storage_path = f"{company_id}/{uuid4()}.{ext}"
+    tmp_path, sha256, size = await _spool(file)
 
-    content = await file.read()
+    if size == 0:
+        _discard(tmp_path)
+        raise HTTPException(status_code=400, detail="Empty file")
 
-    try:
-        result = supabase.storage.from_("company_docs").upload(
-            path=storage_path,
-            file=content,
-            file_options={"content-type": file.content_type},
+    # content-addressed: the same bytes always land on the same object
+    object_name = f"{sha256}.{EXTENSIONS[file.content_type]}"
+    storage_path = f"{company_id}/{object_name}"
+
+    # SQLite calls off the event loop: a storage sync holds the index lock
+    existing = await asyncio.to_thread(_find_duplicate, company_id, sha256)
+    if existing and existing["status"] != FAILED:
+        _discard(tmp_path)
+        return {
+            "message": "Already uploaded",
+            "path": existing["document_id"],
+            "filename": file.filename,
+            "job_id": existing["job_id"],
+            "status": existing["status"],
+            "duplicate": True,
+        }
+
+    # a previous upload whose indexing failed is re-indexed, not re-stored
+    if not existing:
+        try:
+            await asyncio.to_thread(
+                get_document_storage().upload,
+                storage_path,
+                tmp_path,
+                file.content_type,
+            )
+        except Exception as e:
+            _discard(tmp_path)
+            raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+
+        # the indexing job covers this object; the next query re-lists storage
+        await asyncio.to_thread(
+            DOCUMENT_INDEX.record_upload, company_id, object_name, storage_path, size,
         )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+
+    job_id = await asyncio.to_thread(INDEX_JOBS.create, company_id, storage_path, sha256)
+    background_tasks.add_task(run_index_job, job_id, company_id, storage_path, tmp_path)
 
     return {
         "message": "Uploaded successfully",
-        "path": result.path,
+        "path": storage_path,
         "filename": file.filename,
+        "job_id": job_id,
+        "status": QUEUED,
+        "duplicate": False,
     }
+
+
+@router.get("/jobs/{job_id}")
+async def get_index_job(
+    job_id: str,
+    current_user: AuthUser = Depends(get_current_user),
+):
+    job = await asyncio.to_thread(INDEX_JOBS.get, job_id, current_user.company_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
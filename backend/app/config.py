@@ -22,8 +22,44 @@ class Settings(BaseSettings):
     GROQ_BASE_URL: str = "https://api.groq.com/openai/v1"
     MODEL_NAME: str
 
-    CONSUMER_KEY: str
-    CONSUMER_SECRET: str
+    # EPO OPS credentials; only needed with PATENT_PROVIDER=ops
+    CONSUMER_KEY: str = ""
+    CONSUMER_SECRET: str = ""
+
+    CACHE_DB_PATH: str = "./novusai_cache.db"
+    WEB_SEARCH_CACHE_TTL_SECONDS: int = 6 * 60 * 60
+    WEB_DOMAIN_LIST_PATH: str = ""
+    PATENT_SEARCH_CACHE_TTL_SECONDS: int = 7 * 24 * 60 * 60
+    PATENT_DOCUMENT_CACHE_TTL_SECONDS: int = 90 * 24 * 60 * 60
+
+    # "ops" (live EPO) or "local" (bundled mock data)
+    PATENT_PROVIDER: str = "ops"
+    PATENT_DATA_DIR: str = ""
+    PATENT_MOCK_LATENCY_MS: float = 0.0
+    PATENT_MOCK_LATENCY_JITTER_MS: float = 0.0
+
+    DOCUMENT_INDEX_DB_PATH: str = "./novusai_documents.db"
+    DOCUMENT_MANIFEST_TTL_SECONDS: int = 60
+    VECTOR_INDEX_DIR: str = "./vector_index"
+    VECTOR_SEARCH_ENABLED: bool = True
+
+    # "supabase" (company_docs bucket) or "local" (directory tree)
+    DOCUMENT_STORAGE: str = "supabase"
+    DOCUMENT_STORAGE_DIR: str = "./document_storage"
+    EXTRACTION_WORKERS: int = 0  # 0 → one per CPU
+    EXTRACTION_TIMEOUT_SECONDS: float = 60.0
+    MAX_UPLOAD_BYTES: int = 50 * 1024 * 1024
+    UPLOAD_TMP_DIR: str = ""
+    # queued/running jobs untouched this long count as failed (worker died)
+    INDEX_JOB_STALE_SECONDS: int = 30 * 60
+
+    MARKET_DATA_DIR: str = ""
+    MARKET_COMPILED_DIR: str = "./market_data_cache"
+
+    # Monte Carlo forecast bands (see services/forecast.py)
+    FORECAST_PATHS: int = 4000
+    FORECAST_CAGR_SD_POINTS: float = 3.0
+    FORECAST_SIZE_SD: float = 0.10
 
     class Config:
         env_file = str(ENV_PATH)
@@ -82,12 +82,14 @@ from app.pre_synthesis.api import router as mistral_router
 from app.pre_synthesis.synonym_api import router as synonym_router
 from app.agents.history import router as history_router
 from app.api.documents import router as documents_router
+from app.services import text_extraction
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("🚀 Starting NovusAI Drug Repurposing Platform")
     yield
+    text_extraction.shutdown()
     logger.info("🛑 Shutting down NovusAI")
 
 
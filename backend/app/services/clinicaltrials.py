@@ -1,20 +1,24 @@
 import requests
+import sys
 from typing import List, Optional
 from dataclasses import dataclass
 from urllib.parse import urlencode
 import logging
 
+from app.services.query_planner import QueryRejected
+
 logger = logging.getLogger("clinicaltrials-client")
 
 
-@dataclass
+# Compact, slotted trial record. Only the fields used for scoring and
+# rendering are kept, so large retrieval pools stay cheap to hold in memory.
+@dataclass(slots=True)
 class TrialHit:
     nct_id: str
     title: str
     phase: Optional[str]
     status: str
     sponsor: str
-    conditions: List[str]
     locations_count: int
     url: str
     start_year: Optional[int] = None
@@ -27,14 +31,21 @@ class ClinicalTrialsError(Exception):
 
 class ClinicalTrialsClient:
     BASE_URL = "https://clinicaltrials.gov/api/v2/studies"
-
-    def search_studies(self, term: str, limit: int = 20) -> List[TrialHit]:
+    MAX_PAGE_SIZE = 1000
+    MAX_TERM_LENGTH = 1500
+
+    def search_studies(
+        self,
+        term: str,
+        limit: int = 20,
+        raise_on_reject: bool = False,
+    ) -> List[TrialHit]:
         if not term.strip():
             return []
 
         params = {
             "query.term": term,
-            "pageSize": limit
+            "pageSize": min(limit, self.MAX_PAGE_SIZE)
         }
 
         url = f"{self.BASE_URL}?{urlencode(params)}"
@@ -49,7 +60,9 @@ class ClinicalTrialsClient:
             }
         )
 
-        if resp.status_code == 400:
+        if resp.status_code in (400, 413):
+            if raise_on_reject:
+                raise QueryRejected(f"HTTP {resp.status_code}")
             return []
 
         if resp.status_code != 200:
@@ -66,7 +79,6 @@ class ClinicalTrialsClient:
             ident = proto.get("identificationModule", {})
             status = proto.get("statusModule", {})
             sponsor = proto.get("sponsorCollaboratorsModule", {})
-            cond = proto.get("conditionsModule", {})
             design = proto.get("designModule", {})
             loc = proto.get("contactsLocationsModule", {})
 
@@ -79,15 +91,16 @@ class ClinicalTrialsClient:
             ).get("year")
 
             phases = design.get("phases") or []
+            phase = phases[0] if phases else None
 
             trials.append(
                 TrialHit(
                     nct_id=nct,
                     title=ident.get("briefTitle", ""),
-                    phase=phases[0] if phases else None,
-                    status=status.get("overallStatus", "Unknown"),
+                    # phase / status repeat across every trial → intern them
+                    phase=sys.intern(phase) if phase else None,
+                    status=sys.intern(status.get("overallStatus", "Unknown")),
                     sponsor=sponsor.get("leadSponsor", {}).get("name", "Unknown"),
-                    conditions=cond.get("conditions", []),
                     locations_count=len(loc.get("locations", [])),
                     url=f"https://clinicaltrials.gov/study/{nct}",
                     start_year=start_year
@@ -2,6 +2,8 @@ from typing import Dict, Any, Optional, List
 import time
 import uuid
 
+from app.services.evidence import EvidenceBundle
+
 _CONVERSATIONS: Dict[str, Dict[str, Any]] = {}
 
 
@@ -67,7 +69,7 @@ def update_conversation(
     mode: Optional[str] = None,
     last_intent: Optional[str] = None,
 
-    evidence_cache: Optional[Dict[str, str]] = None,
+    evidence_cache: Optional[Dict[str, EvidenceBundle]] = None,
 
     last_discussed_drug: Optional[str] = None,
     last_discussed_condition: Optional[str] = None,
@@ -0,0 +1,444 @@
+# app/services/document_index.py
+
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.config import settings
+
+# porter stemming so "patients"/"patient" and "treated"/"treatment" meet
+FTS_TOKENIZER = "porter unicode61 remove_diacritics 2"
+
+_UPSERT_SQL = (
+    "INSERT INTO documents "
+    "(document_id, company_id, document_type, raw_text, indexed_at) "
+    "VALUES (?, ?, ?, ?, ?) "
+    "ON CONFLICT(document_id) DO UPDATE SET "
+    "company_id = excluded.company_id, "
+    "document_type = excluded.document_type, "
+    "raw_text = excluded.raw_text, "
+    "indexed_at = excluded.indexed_at"
+)
+
+# external-content FTS table kept in sync with `documents` by triggers
+_FTS_SCHEMA = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5("
+    "raw_text, content='documents', content_rowid='id', "
+    f"tokenize='{FTS_TOKENIZER}')",
+    "CREATE TRIGGER IF NOT EXISTS documents_ai AFTER INSERT ON documents BEGIN "
+    "INSERT INTO documents_fts (rowid, raw_text) VALUES (new.id, new.raw_text); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS documents_ad AFTER DELETE ON documents BEGIN "
+    "INSERT INTO documents_fts (documents_fts, rowid, raw_text) "
+    "VALUES ('delete', old.id, old.raw_text); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS documents_au AFTER UPDATE ON documents BEGIN "
+    "INSERT INTO documents_fts (documents_fts, rowid, raw_text) "
+    "VALUES ('delete', old.id, old.raw_text); "
+    "INSERT INTO documents_fts (rowid, raw_text) VALUES (new.id, new.raw_text); "
+    "END",
+)
+
+# overlapping word windows; a mention near a boundary lands whole in one of two
+PASSAGE_WORDS = 120
+PASSAGE_OVERLAP = 30
+
+_WORD_RE = re.compile(r"\S+")
+
+_PASSAGE_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS passages ("
+    "id INTEGER PRIMARY KEY, "
+    "document_id TEXT NOT NULL, "
+    "company_id INTEGER NOT NULL, "
+    "ord INTEGER NOT NULL, "
+    "text TEXT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS passages_document ON passages (document_id)",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS passages_fts USING fts5("
+    "text, content='passages', content_rowid='id', "
+    f"tokenize='{FTS_TOKENIZER}')",
+    "CREATE TRIGGER IF NOT EXISTS passages_ai AFTER INSERT ON passages BEGIN "
+    "INSERT INTO passages_fts (rowid, text) VALUES (new.id, new.text); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS passages_ad AFTER DELETE ON passages BEGIN "
+    "INSERT INTO passages_fts (passages_fts, rowid, text) "
+    "VALUES ('delete', old.id, old.text); "
+    "END",
+)
+
+
+def split_passages(
+    text: str,
+    size: int = PASSAGE_WORDS,
+    overlap: int = PASSAGE_OVERLAP,
+) -> List[str]:
+    """Word windows of `size` words, consecutive windows sharing `overlap`."""
+    spans = [m.span() for m in _WORD_RE.finditer(text)]
+    if not spans:
+        return []
+
+    step = max(size - overlap, 1)
+    passages = []
+    for start in range(0, len(spans), step):
+        window = spans[start:start + size]
+        passages.append(" ".join(text[window[0][0]:window[-1][1]].split()))
+        if start + size >= len(spans):
+            break
+    return passages
+
+
+def fts_phrase(text: str) -> str:
+    """Quote free text as one FTS5 phrase (multi-word terms stay adjacent)."""
+    return '"' + " ".join(text.split()).replace('"', '""') + '"'
+
+
+def fts_any(terms: Sequence[str]) -> str:
+    """Synonym group: any of the phrases."""
+    phrases = [fts_phrase(t) for t in terms if t.strip()]
+    if len(phrases) == 1:
+        return phrases[0]
+    return "(" + " OR ".join(phrases) + ")"
+
+
+class DocumentIndex:
+    """
+    Local store of extracted document text, keyed by company.
+
+    Written when a document is uploaded (or once per company by the
+    storage backfill) so queries never download or re-parse files.
+    Same connection model as SQLiteTTLCache: lazy, shared, WAL.
+
+    Text is also indexed in an FTS5 table, so search_passages() is a
+    postings lookup ranked by BM25 instead of a scan over every document.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = str(path)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(
+                self.path,
+                check_same_thread=False,
+                isolation_level=None,
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                "id INTEGER PRIMARY KEY, "
+                "document_id TEXT NOT NULL UNIQUE, "
+                "company_id INTEGER NOT NULL, "
+                "document_type TEXT NOT NULL, "
+                "raw_text TEXT NOT NULL, "
+                "indexed_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS documents_company "
+                "ON documents (company_id)"
+            )
+            # last seen storage listing per company; etag NULL marks an
+            # object indexed from an upload before it was ever listed
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS manifest ("
+                "company_id INTEGER NOT NULL, "
+                "name TEXT NOT NULL, "
+                "document_id TEXT NOT NULL, "
+                "size INTEGER NOT NULL, "
+                "updated_at TEXT, "
+                "etag TEXT, "
+                "PRIMARY KEY (company_id, name))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS company_sync ("
+                "company_id INTEGER PRIMARY KEY, "
+                "synced_at REAL NOT NULL)"
+            )
+            # bumped on every passage write / delete; rowids get reused after
+            # a delete, so counts and max(id) cannot version a company's passages
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS passage_generation ("
+                "company_id INTEGER PRIMARY KEY, "
+                "generation INTEGER NOT NULL)"
+            )
+            for stmt in _FTS_SCHEMA + _PASSAGE_SCHEMA:
+                conn.execute(stmt)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS passages_company "
+                "ON passages (company_id, id)"
+            )
+            self._conn = conn
+        return self._conn
+
+    # ---------------------------
+    # WRITES
+    # ---------------------------
+
+    @staticmethod
+    def _bump_generation(conn: sqlite3.Connection, company_ids: Iterable[int]) -> None:
+        conn.executemany(
+            "INSERT INTO passage_generation (company_id, generation) VALUES (?, 1) "
+            "ON CONFLICT (company_id) DO UPDATE SET generation = generation + 1",
+            [(c,) for c in set(company_ids)],
+        )
+
+    @classmethod
+    def _write_passages(
+        cls,
+        conn: sqlite3.Connection,
+        document_id: str,
+        company_id: int,
+        raw_text: str,
+    ) -> None:
+        cls._bump_generation(conn, [company_id])
+        conn.execute("DELETE FROM passages WHERE document_id = ?", (document_id,))
+        conn.executemany(
+            "INSERT INTO passages (document_id, company_id, ord, text) "
+            "VALUES (?, ?, ?, ?)",
+            [
+                (document_id, company_id, i, text)
+                for i, text in enumerate(split_passages(raw_text))
+            ],
+        )
+
+    @classmethod
+    def _write(cls, conn: sqlite3.Connection, rows: List[Tuple]) -> None:
+        conn.executemany(_UPSERT_SQL, rows)
+        for document_id, company_id, _, raw_text, _ in rows:
+            cls._write_passages(conn, document_id, company_id, raw_text)
+
+    @classmethod
+    def _delete(cls, conn: sqlite3.Connection, document_ids: Iterable[str]) -> None:
+        ids = [(d,) for d in document_ids]
+        cls._bump_generation(conn, [
+            company_id
+            for (d,) in ids
+            for (company_id,) in conn.execute(
+                "SELECT company_id FROM documents WHERE document_id = ?", (d,)
+            )
+        ])
+        conn.executemany("DELETE FROM passages WHERE document_id = ?", ids)
+        conn.executemany("DELETE FROM documents WHERE document_id = ?", ids)
+
+    def _transaction(self, fn) -> None:
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN")
+            try:
+                fn(conn)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def add(
+        self,
+        company_id: int,
+        document_id: str,
+        document_type: str,
+        raw_text: str,
+    ) -> None:
+        self._transaction(lambda conn: self._write(
+            conn, [(document_id, company_id, document_type, raw_text, time.time())]
+        ))
+
+    def remove(self, document_id: str) -> None:
+        self._transaction(lambda conn: self._delete(conn, [document_id]))
+
+    # ---------------------------
+    # STORAGE MANIFEST
+    # ---------------------------
+
+    def record_upload(self, company_id: int, name: str, document_id: str, size: int) -> None:
+        """
+        Upload endpoint hook: the object is known (no re-download on the
+        next sync) and the company's listing is marked stale.
+        """
+        def _record(conn: sqlite3.Connection) -> None:
+            conn.execute(
+                "INSERT OR REPLACE INTO manifest "
+                "(company_id, name, document_id, size, updated_at, etag) "
+                "VALUES (?, ?, ?, ?, NULL, NULL)",
+                (company_id, name, document_id, size),
+            )
+            conn.execute("DELETE FROM company_sync WHERE company_id = ?", (company_id,))
+
+        self._transaction(_record)
+
+    def apply_sync(
+        self,
+        company_id: int,
+        documents: Iterable[Dict],
+        entries: Iterable[Dict],
+        removed: Iterable[str],
+    ) -> None:
+        """
+        One listing diff, atomically: (re)indexed documents, refreshed
+        manifest entries, and objects that disappeared from storage.
+        """
+        now = time.time()
+        rows = [
+            (d["document_id"], company_id, d["document_type"], d["raw_text"], now)
+            for d in documents
+        ]
+        removed = list(removed)
+
+        def _apply(conn: sqlite3.Connection) -> None:
+            self._write(conn, rows)
+            self._delete(conn, removed)
+            conn.executemany(
+                "DELETE FROM manifest WHERE company_id = ? AND document_id = ?",
+                [(company_id, d) for d in removed],
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO manifest "
+                "(company_id, name, document_id, size, updated_at, etag) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (company_id, e["name"], e["document_id"], e["size"],
+                     e["updated_at"], e["etag"])
+                    for e in entries
+                ],
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO company_sync (company_id, synced_at) VALUES (?, ?)",
+                (company_id, now),
+            )
+
+        self._transaction(_apply)
+
+    # ---------------------------
+    # READS
+    # ---------------------------
+
+    def manifest(self, company_id: int) -> Dict[str, Dict]:
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT m.name, m.document_id, m.size, m.updated_at, m.etag, "
+                "EXISTS (SELECT 1 FROM documents d WHERE d.document_id = m.document_id) "
+                "FROM manifest m WHERE m.company_id = ?",
+                (company_id,),
+            ).fetchall()
+        return {
+            name: {"document_id": d, "size": size, "updated_at": u, "etag": e, "indexed": bool(i)}
+            for name, d, size, u, e, i in rows
+        }
+
+    def synced_at(self, company_id: int) -> float:
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT synced_at FROM company_sync WHERE company_id = ?",
+                (company_id,),
+            ).fetchone()
+        return row[0] if row else 0.0
+
+    def has_document(self, company_id: int, document_id: str) -> bool:
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT 1 FROM documents WHERE company_id = ? AND document_id = ?",
+                (company_id, document_id),
+            ).fetchone()
+        return row is not None
+
+    def documents(self, company_id: int) -> List[Dict]:
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT document_id, document_type, raw_text FROM documents "
+                "WHERE company_id = ? ORDER BY document_id",
+                (company_id,),
+            ).fetchall()
+        return [
+            {"document_id": d, "document_type": t, "raw_text": text}
+            for d, t, text in rows
+        ]
+
+    def search_passages(
+        self,
+        company_id: int,
+        document_match: str,
+        passage_match: str,
+        limit: int,
+    ) -> List[Dict]:
+        """
+        Top passages across the documents that satisfy `document_match`.
+
+        Document-level matching keeps the AND semantics (drug and condition
+        may sit in different passages); passages are then ranked by BM25
+        on `passage_match`, so windows mentioning both terms come first.
+        """
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT p.id, p.document_id, d.document_type, p.ord, p.text, "
+                "bm25(passages_fts) AS rank "
+                "FROM passages_fts "
+                "JOIN passages p ON p.id = passages_fts.rowid "
+                "JOIN documents d ON d.document_id = p.document_id "
+                "WHERE passages_fts MATCH ? AND p.company_id = ? "
+                "AND p.document_id IN ("
+                "  SELECT dd.document_id FROM documents_fts "
+                "  JOIN documents dd ON dd.id = documents_fts.rowid "
+                "  WHERE documents_fts MATCH ? AND dd.company_id = ?"
+                ") "
+                "ORDER BY rank LIMIT ?",
+                (passage_match, company_id, document_match, company_id, limit),
+            ).fetchall()
+        return [
+            {
+                "passage_id": pid,
+                "document_id": d,
+                "document_type": t,
+                "passage_index": i,
+                "text": text,
+                "score": -rank,
+            }
+            for pid, d, t, i, text, rank in rows
+        ]
+
+    # ---------------------------
+    # PASSAGES (VECTOR INDEX FEED)
+    # ---------------------------
+
+    def passage_signature(self, company_id: int) -> str:
+        """Changes whenever a company's passages are added, replaced or removed."""
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT generation FROM passage_generation WHERE company_id = ?",
+                (company_id,),
+            ).fetchone()
+        return f"g{row[0] if row else 0}"
+
+    def passages(self, company_id: int) -> List[Tuple[int, str]]:
+        with self._lock:
+            return self._connect().execute(
+                "SELECT id, text FROM passages WHERE company_id = ? ORDER BY id",
+                (company_id,),
+            ).fetchall()
+
+    def passages_by_id(self, company_id: int, ids: Sequence[int]) -> Dict[int, Dict]:
+        if not ids:
+            return {}
+        placeholders = ",".join("?" * len(ids))
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT p.id, p.document_id, d.document_type, p.ord, p.text "
+                "FROM passages p JOIN documents d ON d.document_id = p.document_id "
+                f"WHERE p.company_id = ? AND p.id IN ({placeholders})",
+                (company_id, *ids),
+            ).fetchall()
+        return {
+            pid: {
+                "passage_id": pid,
+                "document_id": d,
+                "document_type": t,
+                "passage_index": i,
+                "text": text,
+            }
+            for pid, d, t, i, text in rows
+        }
+
+
+DOCUMENT_INDEX = DocumentIndex(settings.DOCUMENT_INDEX_DB_PATH)
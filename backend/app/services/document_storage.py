@@ -0,0 +1,162 @@
+# app/services/document_storage.py
+
+"""
+Company document storage behind one interface.
+
+- "supabase" : the company_docs bucket (production)
+- "local"    : a directory tree, for dev / tests without Supabase
+
+Listings carry size, updated_at and an ETag so callers can tell which
+objects changed without downloading them.
+"""
+
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List, Optional, Protocol
+
+from app.config import settings
+
+BUCKET = "company_docs"
+LIST_PAGE_SIZE = 1000
+
+
+@dataclass(slots=True)
+class StorageObject:
+    name: str
+    size: int
+    updated_at: str
+    etag: str
+
+
+class DocumentStorage(Protocol):
+    def list(self, folder: str) -> List[StorageObject]:
+        ...
+
+    def download(self, path: str) -> bytes:
+        ...
+
+    def upload(self, path: str, file_path: str, content_type: str) -> None:
+        ...
+
+
+# ======================================================
+# SUPABASE
+# ======================================================
+
+class SupabaseStorage:
+    def __init__(self, bucket: str = BUCKET):
+        from app.services.supabase_client import supabase
+
+        self._bucket = supabase.storage.from_(bucket)
+
+    def list(self, folder: str) -> List[StorageObject]:
+        objects: List[StorageObject] = []
+        offset = 0
+        while True:
+            page = self._bucket.list(
+                folder,
+                {
+                    "limit": LIST_PAGE_SIZE,
+                    "offset": offset,
+                    "sortBy": {"column": "name", "order": "asc"},
+                },
+            )
+            for obj in page:
+                meta = obj.get("metadata") or {}
+                # sub-folders come back without metadata
+                if not meta:
+                    continue
+                objects.append(StorageObject(
+                    name=obj["name"],
+                    size=int(meta.get("size") or 0),
+                    updated_at=obj.get("updated_at") or "",
+                    etag=str(meta.get("eTag") or ""),
+                ))
+            if len(page) < LIST_PAGE_SIZE:
+                return objects
+            offset += LIST_PAGE_SIZE
+
+    def download(self, path: str) -> bytes:
+        return self._bucket.download(path)
+
+    def upload(self, path: str, file_path: str, content_type: str) -> None:
+        # content-addressed paths: overwriting means identical bytes
+        self._bucket.upload(
+            path=path,
+            file=file_path,
+            file_options={"content-type": content_type, "upsert": "true"},
+        )
+
+
+# ======================================================
+# LOCAL DIRECTORY
+# ======================================================
+
+class LocalStorage:
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+
+    def _path(self, path: str) -> Path:
+        target = (self.root / path).resolve()
+        if not target.is_relative_to(self.root.resolve()):
+            raise ValueError(f"Path escapes storage root: {path!r}")
+        return target
+
+    def list(self, folder: str) -> List[StorageObject]:
+        directory = self._path(folder)
+        if not directory.is_dir():
+            return []
+
+        objects = []
+        with os.scandir(directory) as it:
+            for entry in it:
+                if not entry.is_file():
+                    continue
+                st = entry.stat()
+                objects.append(StorageObject(
+                    name=entry.name,
+                    size=st.st_size,
+                    updated_at=datetime.fromtimestamp(st.st_mtime, timezone.utc).isoformat(),
+                    etag=f"{st.st_mtime_ns:x}-{st.st_size:x}",
+                ))
+        objects.sort(key=lambda o: o.name)
+        return objects
+
+    def download(self, path: str) -> bytes:
+        return self._path(path).read_bytes()
+
+    def upload(self, path: str, file_path: str, content_type: str) -> None:
+        target = self._path(path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=target.parent, prefix=".upload-")
+        os.close(fd)
+        try:
+            shutil.copyfile(file_path, tmp)
+            os.replace(tmp, target)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+
+# ======================================================
+# SELECTION
+# ======================================================
+
+_STORAGE: Optional[DocumentStorage] = None
+
+
+def get_document_storage() -> DocumentStorage:
+    global _STORAGE
+    if _STORAGE is None:
+        kind = settings.DOCUMENT_STORAGE.strip().lower()
+        if kind == "local":
+            _STORAGE = LocalStorage(settings.DOCUMENT_STORAGE_DIR)
+        elif kind == "supabase":
+            _STORAGE = SupabaseStorage()
+        else:
+            raise ValueError(f"Unknown DOCUMENT_STORAGE: {settings.DOCUMENT_STORAGE!r}")
+    return _STORAGE
@@ -0,0 +1,86 @@
+# app/services/domain_classifier.py
+
+import json
+import re
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+CURRENT_DIR = Path(__file__).resolve().parent
+APP_DIR = CURRENT_DIR.parent
+
+DEFAULT_DOMAIN_LIST_PATH = APP_DIR / "resources" / "web_domains.json"
+
+UNKNOWN_SIGNAL = "UNKNOWN"
+
+_TERMINAL = None  # trie key holding the signal type of a registered domain
+
+
+class DomainListError(Exception):
+    pass
+
+
+class DomainClassifier:
+    """
+    Precompiled web-signal filters.
+
+    - domains are stored in a trie keyed by reversed labels
+      (gov → fda → …), so lookup cost depends on the number of labels in
+      the host, not on the size of the domain list
+    - blocked keywords are folded into one compiled alternation
+    """
+
+    def __init__(self, signal_map: Dict[str, str], blocked_keywords: Iterable[str]):
+        self._trie: Dict[Any, Any] = {}
+        for domain, signal_type in signal_map.items():
+            node = self._trie
+            for label in reversed(domain.lower().strip(".").split(".")):
+                node = node.setdefault(label, {})
+            node[_TERMINAL] = signal_type
+
+        keywords = sorted({k.lower() for k in blocked_keywords if k}, key=len, reverse=True)
+        self._blocked: Optional[re.Pattern] = (
+            re.compile("|".join(map(re.escape, keywords))) if keywords else None
+        )
+
+    @classmethod
+    def from_file(cls, path: str | Path) -> "DomainClassifier":
+        try:
+            with Path(path).open("r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            raise DomainListError(f"Failed to load {path}: {e}") from e
+
+        return cls(
+            signal_map=data.get("signal_map", {}),
+            blocked_keywords=data.get("blocked_keywords", []),
+        )
+
+    def classify(self, domain: str) -> str:
+        host = domain.rsplit("@", 1)[-1].split(":", 1)[0].strip(".")
+
+        node = self._trie
+        match = UNKNOWN_SIGNAL
+        for label in reversed(host.split(".")):
+            node = node.get(label)
+            if node is None:
+                break
+            # longest registered suffix wins
+            match = node.get(_TERMINAL, match)
+        return match
+
+    def is_blocked(self, url: str) -> bool:
+        if self._blocked is None:
+            return False
+        return self._blocked.search(url.lower()) is not None
+
+
+def is_mostly_ascii(text: str, max_non_ascii_ratio: float = 0.05) -> bool:
+    if not text:
+        return False
+    # encode() drops non-ASCII code points in C; the length gap is the count
+    non_ascii = len(text) - len(text.encode("ascii", "ignore"))
+    return non_ascii / len(text) < max_non_ascii_ratio
+
+
+def load_domain_classifier(path: str | Path | None = None) -> DomainClassifier:
+    return DomainClassifier.from_file(path or DEFAULT_DOMAIN_LIST_PATH)
@@ -0,0 +1,448 @@
+# app/services/evidence.py
+
+"""
+Typed agent evidence.
+
+Each agent returns one of these objects. Plain text is produced only at
+the edges — text/plain agent responses and LLM prompts — by render();
+visualization and the conversation cache read the fields directly.
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Union
+
+from app.services.clinicaltrials import TrialHit
+from app.services.patent_service import PatentRecord, render_patents
+
+RULE = "-" * 100
+
+
+def query_mode(drug: Optional[str], conditions: List[str]) -> Optional[str]:
+    if drug and conditions:
+        return "DRUG_AND_CONDITION"
+    if drug:
+        return "DRUG_ONLY"
+    if conditions:
+        return "CONDITION_ONLY"
+    return None
+
+
+# ======================================================
+# CLINICAL
+# ======================================================
+
+@dataclass(slots=True)
+class ClinicalEvidence:
+    drug: str
+    conditions: List[str]
+    trials: List[TrialHit] = field(default_factory=list)
+    signals: Dict[str, Any] = field(default_factory=dict)
+
+    kind = "clinical"
+
+    def render(self) -> str:
+        lines = [
+            "CLINICAL TRIAL SIGNALS",
+            f"Drug      : {self.drug}",
+            f"Conditions: {', '.join(self.conditions) or 'N/A'}\n",
+        ]
+
+        if not self.trials:
+            lines.append("No registered clinical trials found.")
+            lines.append("This suggests a lack of formal clinical investigation.\n")
+            return "\n".join(lines)
+
+        signals = self.signals
+        lines.append(f"Total matching trials      : {signals['total_trials']}")
+        lines.append(f"Recruiting trials          : {signals['recruiting_trials']}")
+        lines.append(
+            f"Latest trial start year    : {signals['latest_start_year'] or 'N/A'}"
+        )
+        lines.append("Phase distribution:")
+        for p, c in signals["phase_distribution"].items():
+            lines.append(f"  - {p} : {c}")
+
+        lines.append("\nTOP CLINICAL TRIALS (by score)\n")
+
+        for rank, t in enumerate(self.trials, start=1):
+            lines.append(f"{rank}. {t.title}")
+            lines.append(f"   Phase    : {t.phase or 'UNKNOWN'}")
+            lines.append(f"   Status   : {t.status}")
+            lines.append(f"   Sponsor  : {t.sponsor}")
+            lines.append(f"   NCT ID   : {t.nct_id}")
+            lines.append(f"   URL      : {t.url}\n")
+
+        return "\n".join(lines)
+
+
+# ======================================================
+# LITERATURE
+# ======================================================
+
+@dataclass(slots=True)
+class Paper:
+    pmid: str
+    title: str
+    journal: str
+    publication_year: Optional[int]
+    study_design: str
+    population_flag: str
+    abstract_snippet: str
+    pubmed_url: str
+    score: float
+
+
+@dataclass(slots=True)
+class LiteratureEvidence:
+    drug: str
+    conditions: List[str]
+    papers: List[Paper] = field(default_factory=list)
+
+    kind = "literature"
+
+    def render(self) -> str:
+        mode = query_mode(self.drug, self.conditions)
+        if mode is None:
+            return (
+                "LITERATURE EVIDENCE (PUBMED)\n\n"
+                "No drug or condition provided.\n"
+                "At least one of drug or condition must be specified."
+            )
+
+        if not self.papers:
+            return (
+                "LITERATURE EVIDENCE (PUBMED)\n\n"
+                f"Query mode : {mode}\n"
+                f"Drug       : {self.drug or 'N/A'}\n"
+                f"Conditions : {', '.join(self.conditions) or 'N/A'}\n\n"
+                "No relevant PubMed literature found where the query terms "
+                "appear in the title or abstract.\n"
+                "This suggests a lack of direct published evidence."
+            )
+
+        lines = [
+            "LITERATURE EVIDENCE (PUBMED)\n",
+            f"Query mode : {mode}",
+            f"Drug       : {self.drug or 'N/A'}",
+            f"Conditions : {', '.join(self.conditions) or 'N/A'}\n",
+            f"Total relevant papers : {len(self.papers)}\n",
+            "TOP PUBMED EVIDENCE\n",
+        ]
+
+        for idx, p in enumerate(self.papers, start=1):
+            lines.extend([
+                f"{idx}. {p.title}",
+                f"   Journal     : {p.journal}",
+                f"   Year        : {p.publication_year or 'N/A'}",
+                f"   Study type  : {p.study_design}",
+                f"   Population  : {p.population_flag}",
+                f"   PMID        : {p.pmid}",
+                f"   URL         : {p.pubmed_url}\n",
+                "   Abstract:",
+                p.abstract_snippet or "   Abstract not available.",
+                "\n" + RULE,
+            ])
+
+        return "\n".join(lines)
+
+
+# ======================================================
+# PATENTS
+# ======================================================
+
+@dataclass(slots=True)
+class PatentEvidence:
+    drug: Optional[str]
+    conditions: List[str]
+    patents: List[PatentRecord] = field(default_factory=list)
+
+    kind = "patents"
+
+    def render(self) -> str:
+        return render_patents(self.patents)
+
+
+# ======================================================
+# MARKET
+# ======================================================
+
+@dataclass(slots=True)
+class MarketFigures:
+    current_usd_bn: Optional[float]
+    forecast_2030_usd_bn: Optional[float]
+    cagr_percent: Optional[float]
+    patient_population_m: Optional[float]
+    treated_percent: Optional[float]
+
+
+@dataclass(slots=True)
+class MarketEvidence:
+    drug: str
+    conditions: List[str]
+    # matched dataset row; None when nothing in the market data matched
+    figures: Optional[MarketFigures] = None
+    condition: Optional[str] = None
+    match_score: float = 1.0
+    number_of_competitors: Optional[int] = None
+    branded_vs_generic_mix: str = ""
+    key_competitor_classes: List[str] = field(default_factory=list)
+    commercial_signals: List[str] = field(default_factory=list)
+    risks: List[str] = field(default_factory=list)
+
+    kind = "market"
+
+    @classmethod
+    def from_row(
+        cls,
+        drug: str,
+        conditions: List[str],
+        row: Dict[str, Any],
+        condition: Optional[str],
+        match_score: float,
+    ) -> "MarketEvidence":
+        return cls(
+            drug=drug,
+            conditions=conditions,
+            figures=MarketFigures(
+                current_usd_bn=row["global_market_size_usd_bn"],
+                forecast_2030_usd_bn=row["forecast_market_size_usd_bn_2030"],
+                cagr_percent=row["cagr_percent"],
+                patient_population_m=row["patient_population_millions"],
+                treated_percent=row["treated_population_percent"],
+            ),
+            condition=condition,
+            match_score=match_score,
+            number_of_competitors=row["number_of_competitors"],
+            branded_vs_generic_mix=row["branded_vs_generic_mix"],
+            key_competitor_classes=row["key_competitor_classes"],
+            commercial_signals=row.get("commercial_signals") or [],
+            risks=row.get("risks") or [],
+        )
+
+    def render(self) -> str:
+        mode = query_mode(self.drug, self.conditions)
+        if mode is None:
+            return "MARKET SIGNALS\n\nNo drug or condition provided.\n"
+
+        f = self.figures
+        if f is None:
+            return (
+                "MARKET SIGNALS\n\n"
+                f"Query mode : {mode}\n"
+                "No commercial market coverage found.\n"
+            )
+
+        lines = []
+
+        lines.append("MARKET SIGNALS")
+        lines.append(f"Query mode : {mode}")
+        if self.drug:
+            lines.append(f"Drug       : {self.drug}")
+        if self.condition:
+            lines.append(f"Condition  : {self.condition}")
+        if self.match_score < 1.0:
+            lines.append(f"Match      : approximate (score {self.match_score})")
+        lines.append("")
+
+        lines.append("Market overview:")
+        lines.append(f"  - Current market size (USD bn)      : {f.current_usd_bn}")
+        lines.append(f"  - Forecast 2030 market size (USD bn): {f.forecast_2030_usd_bn}")
+        lines.append(f"  - CAGR (%)                          : {f.cagr_percent}")
+        lines.append(f"  - Patient population (millions)     : {f.patient_population_m}")
+        lines.append(f"  - Treated population (%)            : {f.treated_percent}\n")
+
+        lines.append("Competitive landscape:")
+        lines.append(f"  - Number of competitors : {self.number_of_competitors}")
+        lines.append(f"  - Branded vs generic mix : {self.branded_vs_generic_mix}")
+        lines.append(f"  - Key competitor classes : {', '.join(self.key_competitor_classes)}\n")
+
+        if self.commercial_signals:
+            lines.append("Commercial signals:")
+            for s in self.commercial_signals:
+                lines.append(f"  - {s}")
+            lines.append("")
+
+        if self.risks:
+            lines.append("Risks:")
+            for r in self.risks:
+                lines.append(f"  - {r}")
+            lines.append("")
+
+        return "\n".join(lines)
+
+
+# ======================================================
+# WEB INTELLIGENCE
+# ======================================================
+
+@dataclass(slots=True)
+class WebSignal:
+    title: str
+    snippet: str
+    source_domain: str
+    url: str
+    signal_type: str
+    confidence: str
+
+
+@dataclass(slots=True)
+class WebEvidence:
+    drug: str
+    conditions: List[str]
+    signals: List[WebSignal] = field(default_factory=list)
+
+    kind = "web"
+
+    def render(self) -> str:
+        if not self.drug and not self.conditions:
+            return (
+                "WEB INTELLIGENCE SIGNALS\n\n"
+                "No drug or condition provided.\n"
+                "At least one of drug or condition must be specified."
+            )
+
+        lines: List[str] = []
+
+        lines.append("WEB INTELLIGENCE SIGNALS\n")
+        lines.append(f"Drug       : {self.drug or 'N/A'}")
+        lines.append(f"Conditions : {', '.join(self.conditions) or 'N/A'}\n")
+        lines.append(f"Total signals found : {len(self.signals)}\n")
+
+        if not self.signals:
+            lines.append(
+                "No relevant web intelligence signals were found.\n"
+                "Signals are non-clinical and absence does not imply lack of evidence."
+            )
+            return "\n".join(lines)
+
+        for idx, s in enumerate(self.signals, start=1):
+            lines.append(f"{idx}. {s.title}")
+            lines.append(f"   Source     : {s.source_domain}")
+            lines.append(f"   Type       : {s.signal_type}")
+            lines.append(f"   Confidence : {s.confidence}")
+            lines.append(f"   URL        : {s.url}\n")
+            lines.append("   Snippet:")
+            lines.append(s.snippet or "   Snippet not available.")
+            lines.append("\n" + RULE)
+
+        lines.append(
+            "\nNOTE:\n"
+            "Web intelligence signals are non-validated, non-clinical, English-only, "
+            "and contextual. They must not be treated as evidence. But only as sign of interest."
+        )
+
+        return "\n".join(lines)
+
+
+# ======================================================
+# INTERNAL KNOWLEDGE
+# ======================================================
+
+@dataclass(slots=True)
+class Passage:
+    passage_id: int
+    document_id: str
+    document_type: str
+    passage_index: int
+    text: str
+    score: float
+    match: str
+
+
+@dataclass(slots=True)
+class InternalEvidence:
+    drug: str
+    conditions: List[str]
+    passages: List[Passage] = field(default_factory=list)
+
+    kind = "internal"
+
+    def render(self) -> str:
+        mode = query_mode(self.drug, self.conditions)
+        if mode is None:
+            return (
+                "INTERNAL KNOWLEDGE SIGNALS\n\n"
+                "No drug or condition provided.\n"
+                "At least one must be specified."
+            )
+
+        if not self.passages:
+            return (
+                "INTERNAL KNOWLEDGE SIGNALS\n\n"
+                f"Query mode : {mode}\n"
+                f"Drug       : {self.drug or 'N/A'}\n"
+                f"Conditions : {', '.join(self.conditions) or 'N/A'}\n\n"
+                "No internal knowledge records matched."
+            )
+
+        lines = []
+        lines.append("INTERNAL KNOWLEDGE SIGNALS\n")
+        lines.append(f"Query mode : {mode}")
+        lines.append(f"Drug       : {self.drug or 'N/A'}")
+        lines.append(f"Conditions : {', '.join(self.conditions) or 'N/A'}\n")
+        documents = {p.document_id for p in self.passages}
+        lines.append(f"Total internal records : {len(documents)}")
+        lines.append(f"Top passages           : {len(self.passages)}\n")
+
+        for idx, p in enumerate(self.passages, start=1):
+            lines.append(f"{idx}. Document ID : {p.document_id}")
+            lines.append(f"   Type        : {p.document_type}")
+            lines.append(f"   Passage     : #{p.passage_index + 1}")
+            lines.append(f"   Relevance   : {p.score:.2f} ({p.match})")
+            lines.append("   Excerpt:")
+            lines.append(p.text)
+            lines.append("\n" + RULE)
+
+        return "\n".join(lines)
+
+
+# ======================================================
+# BUNDLE
+# ======================================================
+
+@dataclass(slots=True)
+class AgentFailure:
+    agent: str
+
+    kind = "error"
+
+    def render(self) -> str:
+        return "ERROR: Agent call failed."
+
+
+Evidence = Union[
+    ClinicalEvidence,
+    LiteratureEvidence,
+    PatentEvidence,
+    MarketEvidence,
+    WebEvidence,
+    InternalEvidence,
+    AgentFailure,
+]
+
+
+@dataclass(slots=True)
+class EvidenceBundle:
+    drug: str
+    conditions: List[str]
+    intent: str
+    # agent name → evidence, in orchestration order
+    items: Dict[str, Evidence] = field(default_factory=dict)
+    # chart payload derived from the evidence (see visualization_builder)
+    visualizations: Optional[Dict[str, Any]] = None
+
+    def get(self, agent: str) -> Optional[Evidence]:
+        """The agent's evidence, or None when it was not called or failed."""
+        item = self.items.get(agent)
+        return None if isinstance(item, AgentFailure) else item
+
+    def render(self) -> str:
+        parts: List[str] = ["=== EVIDENCE BUNDLE START ===\n\n"]
+
+        for agent, item in self.items.items():
+            parts.append(f"[AGENT: {agent.upper()}]\n")
+            parts.append(item.render().strip())
+            parts.append("\n\n")
+
+        parts.append("=== EVIDENCE BUNDLE END ===")
+        return "".join(parts)
@@ -0,0 +1,101 @@
+# app/services/forecast.py
+
+"""
+Monte Carlo market forecast bands.
+
+Each path draws a CAGR (normal around the central rate, in percentage
+points) and a starting market-size shock (lognormal). Path values are
+size · (1 + CAGR)^t per year, and the bands are the p10 / p50 / p90 of
+all paths for each year.
+
+Every pair in a batch uses the same standard-normal draws (common random
+numbers). The whole batch is then one broadcast over pair × path × year,
+and a pair gets identical bands alone or in a batch of a thousand.
+"""
+
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.config import settings
+
+FORECAST_YEAR = 2030
+QUANTILES = (10, 50, 90)
+QUANTILE_NAMES = ("p10", "p50", "p90")
+
+# cap on pair × path × year cells held at once
+MAX_CELLS = 4_000_000
+MIN_CAGR_PERCENT = -99.0
+
+
+def central_cagr(
+    current: np.ndarray,
+    cagr: np.ndarray,
+    forecast: np.ndarray,
+    start_year: int,
+) -> np.ndarray:
+    """
+    The rate that takes the current size to the dataset's own forecast by
+    FORECAST_YEAR; pairs without a usable forecast keep their CAGR.
+    """
+    horizon = FORECAST_YEAR - start_year
+    if horizon <= 0:
+        return cagr
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        implied = ((forecast / current) ** (1.0 / horizon) - 1.0) * 100.0
+    usable = np.isfinite(implied) & (forecast > 0)
+    return np.where(usable, implied, cagr)
+
+
+def simulate_bands(
+    current: Sequence[float],
+    cagr: Sequence[float],
+    forecast: Sequence[float],
+    start_year: int,
+    end_year: int = FORECAST_YEAR,
+    paths: Optional[int] = None,
+    seed: int = 0,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Input  : per-pair current size, CAGR % and forecast (NaN = unknown)
+    Output : (years, bands[pair, quantile, year]); NaN rows for pairs
+             without a positive current size
+    """
+    current = np.asarray(current, dtype=np.float64)
+    cagr = np.nan_to_num(np.asarray(cagr, dtype=np.float64))
+    forecast = np.asarray(forecast, dtype=np.float64)
+    paths = paths or settings.FORECAST_PATHS
+
+    years = np.arange(start_year, max(end_year, start_year) + 1)
+    steps = (years - start_year).astype(np.float64)
+
+    rng = np.random.default_rng(seed)
+    z_rate = rng.standard_normal(paths)
+    z_size = rng.standard_normal(paths)
+
+    valid = np.isfinite(current) & (current > 0)
+    log_size = np.log(np.where(valid, current, 1.0))
+    rate = central_cagr(current, cagr, forecast, start_year)
+
+    # log-space: log v = log size + size shock + t · log(1 + g)
+    size_shock = settings.FORECAST_SIZE_SD * z_size                       # (path,)
+    growth = np.log1p(np.maximum(
+        rate[:, None] + settings.FORECAST_CAGR_SD_POINTS * z_rate[None, :],
+        MIN_CAGR_PERCENT,
+    ) / 100.0)                                                            # (pair, path)
+
+    bands = np.full((len(current), len(QUANTILES), len(years)), np.nan)
+    chunk = max(1, MAX_CELLS // (paths * len(years)))
+    for lo in range(0, len(current), chunk):
+        hi = min(lo + chunk, len(current))
+        log_v = (
+            (log_size[lo:hi, None] + size_shock[None, :])[:, :, None]
+            + growth[lo:hi, :, None] * steps[None, None, :]
+        )                                                                 # (pair, path, year)
+        # quantiles commute with exp, so exponentiate only the bands
+        q = np.percentile(log_v, QUANTILES, axis=1)                       # (quantile, pair, year)
+        bands[lo:hi] = np.exp(q).transpose(1, 0, 2)
+
+    bands[~valid] = np.nan
+    return years, np.round(bands, 2)
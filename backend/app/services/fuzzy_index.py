@@ -0,0 +1,56 @@
+# app/services/fuzzy_index.py
+
+from collections import Counter
+from typing import Dict, FrozenSet, Iterable, List, Set, Tuple
+
+
+def trigrams(text: str) -> FrozenSet[str]:
+    padded = f"  {text} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class TrigramIndex:
+    """
+    Prebuilt trigram postings over already-normalized keys.
+
+    Candidates are gathered from the postings of the query trigrams, so a
+    lookup touches only keys sharing at least one trigram; scoring is the
+    Dice coefficient of the two trigram sets (1.0 = identical).
+    """
+
+    def __init__(self, keys: Iterable[str]):
+        self._keys: List[str] = list(dict.fromkeys(k for k in keys if k))
+        self._grams: List[FrozenSet[str]] = [trigrams(k) for k in self._keys]
+        self._postings: Dict[str, List[int]] = {}
+        for key_id, grams in enumerate(self._grams):
+            for g in grams:
+                self._postings.setdefault(g, []).append(key_id)
+        self._exact: Set[str] = set(self._keys)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def best_matches(
+        self,
+        query: str,
+        limit: int = 3,
+        min_score: float = 0.0,
+    ) -> List[Tuple[str, float]]:
+        if not query:
+            return []
+        if query in self._exact:
+            return [(query, 1.0)]
+
+        q_grams = trigrams(query)
+        shared: Counter = Counter()
+        for g in q_grams:
+            shared.update(self._postings.get(g, ()))
+
+        scored: List[Tuple[str, float]] = []
+        for key_id, overlap in shared.items():
+            score = 2 * overlap / (len(q_grams) + len(self._grams[key_id]))
+            if score >= min_score:
+                scored.append((self._keys[key_id], round(score, 3)))
+
+        scored.sort(key=lambda kv: kv[1], reverse=True)
+        return scored[:limit]
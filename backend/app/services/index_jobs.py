@@ -0,0 +1,173 @@
+# app/services/index_jobs.py
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+from uuid import uuid4
+
+from app.config import settings
+from app.services.internal_knowledge_service import index_document
+from app.services.vector_index import VECTOR_INDEX
+
+logger = logging.getLogger("index-jobs")
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class IndexJobStore:
+    """
+    Upload → indexing job status, plus the per-company content-hash
+    registry used to store and index identical files only once.
+
+    Lives next to the document index so any API worker can answer a
+    status query, whichever worker ran the job.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = str(path)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(
+                self.path,
+                check_same_thread=False,
+                isolation_level=None,
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS index_jobs ("
+                "job_id TEXT PRIMARY KEY, "
+                "company_id INTEGER NOT NULL, "
+                "document_id TEXT NOT NULL, "
+                "status TEXT NOT NULL, "
+                "error TEXT, "
+                "created_at REAL NOT NULL, "
+                "updated_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS uploads ("
+                "company_id INTEGER NOT NULL, "
+                "sha256 TEXT NOT NULL, "
+                "document_id TEXT NOT NULL, "
+                "job_id TEXT NOT NULL, "
+                "PRIMARY KEY (company_id, sha256))"
+            )
+            self._conn = conn
+        return self._conn
+
+    # ---------------------------
+    # UPLOAD REGISTRY
+    # ---------------------------
+
+    def find_upload(self, company_id: int, sha256: str) -> Optional[Dict]:
+        """
+        Latest upload of these bytes; a job left queued / running longer
+        than INDEX_JOB_STALE_SECONDS (its process died) is marked failed.
+        """
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT u.document_id, u.job_id, j.status, j.updated_at "
+                "FROM uploads u LEFT JOIN index_jobs j ON j.job_id = u.job_id "
+                "WHERE u.company_id = ? AND u.sha256 = ?",
+                (company_id, sha256),
+            ).fetchone()
+        if row is None:
+            return None
+
+        document_id, job_id, status, updated_at = row
+        if (
+            status in (QUEUED, RUNNING)
+            and time.time() - updated_at > settings.INDEX_JOB_STALE_SECONDS
+        ):
+            logger.warning("Stale indexing job marked failed | job=%s", job_id)
+            self.update(job_id, FAILED, "Job stalled")
+            status = FAILED
+        return {"document_id": document_id, "job_id": job_id, "status": status}
+
+    def create(self, company_id: int, document_id: str, sha256: str) -> str:
+        """New queued job; the content hash now points at it."""
+        job_id = uuid4().hex
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN")
+            try:
+                conn.execute(
+                    "INSERT INTO index_jobs "
+                    "(job_id, company_id, document_id, status, error, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, NULL, ?, ?)",
+                    (job_id, company_id, document_id, QUEUED, now, now),
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO uploads (company_id, sha256, document_id, job_id) "
+                    "VALUES (?, ?, ?, ?)",
+                    (company_id, sha256, document_id, job_id),
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return job_id
+
+    # ---------------------------
+    # JOB STATUS
+    # ---------------------------
+
+    def update(self, job_id: str, status: str, error: Optional[str] = None) -> None:
+        with self._lock:
+            self._connect().execute(
+                "UPDATE index_jobs SET status = ?, error = ?, updated_at = ? "
+                "WHERE job_id = ?",
+                (status, error, time.time(), job_id),
+            )
+
+    def get(self, job_id: str, company_id: int) -> Optional[Dict]:
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT job_id, document_id, status, error, created_at, updated_at "
+                "FROM index_jobs WHERE job_id = ? AND company_id = ?",
+                (job_id, company_id),
+            ).fetchone()
+        if row is None:
+            return None
+        keys = ("job_id", "document_id", "status", "error", "created_at", "updated_at")
+        return dict(zip(keys, row))
+
+
+INDEX_JOBS = IndexJobStore(settings.DOCUMENT_INDEX_DB_PATH)
+
+
+def run_index_job(job_id: str, company_id: int, document_id: str, tmp_path: str) -> None:
+    """Background task: extract + index the spooled upload, then drop the spool."""
+    INDEX_JOBS.update(job_id, RUNNING)
+    try:
+        with open(tmp_path, "rb") as f:
+            content = f.read()
+        index_document(company_id, document_id, content)
+        INDEX_JOBS.update(job_id, DONE)
+    except Exception as e:
+        logger.exception("Indexing job failed | job=%s | document=%s", job_id, document_id)
+        INDEX_JOBS.update(job_id, FAILED, str(e))
+        return
+    finally:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+
+    # the document is searchable via FTS already; vectors catch up on the
+    # next refresh (any search or sync) if this one fails
+    try:
+        VECTOR_INDEX.refresh(company_id)
+    except Exception:
+        logger.exception("Vector index refresh failed | company=%s", company_id)
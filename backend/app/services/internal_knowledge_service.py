@@ -1,94 +1,245 @@
-from typing import List, Dict, Optional
-import io
-import re
+from typing import List, Dict, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import threading
+import time
 
-from app.services.supabase_client import supabase
-from PyPDF2 import PdfReader
+from app.config import settings
+from app.services.document_index import DOCUMENT_INDEX, fts_any, fts_phrase
+from app.services.document_storage import StorageObject, get_document_storage
+from app.services.text_extraction import extract_documents
+from app.services.vector_index import VECTOR_INDEX
 
+logger = logging.getLogger("internal-knowledge")
 
-def _normalize(text: str) -> str:
-    return re.sub(r"\s+", " ", text.lower())
+MAX_PASSAGES = 8
 
+# hybrid ranking: reciprocal rank fusion of BM25 and vector hits
+RRF_K = 60
+SEMANTIC_MIN_SCORE = 0.1
+DOWNLOAD_CONCURRENCY = 8
 
-def _extract_text_from_pdf(pdf_bytes: bytes) -> str:
-    try:
-        reader = PdfReader(io.BytesIO(pdf_bytes))
-        pages = []
-        for page in reader.pages:
-            pages.append(page.extract_text() or "")
-        return "\n".join(pages)
-    except Exception:
-        # Corrupt / encrypted / image-only PDF
-        return ""
+SUPPORTED_EXTENSIONS = (".pdf", ".txt")
 
+# one sync at a time per company; companies never wait on each other
+_SYNC_LOCKS: Dict[int, threading.Lock] = {}
+_SYNC_LOCKS_GUARD = threading.Lock()
 
-def _extract_text_from_txt(txt_bytes: bytes) -> str:
-    return txt_bytes.decode("utf-8", errors="ignore")
 
+def _sync_lock(company_id: int) -> threading.Lock:
+    with _SYNC_LOCKS_GUARD:
+        return _SYNC_LOCKS.setdefault(company_id, threading.Lock())
 
-def _load_documents(company_id: int) -> List[Dict]:
-    folder = str(company_id)
 
-    result = supabase.storage.from_("company_docs").list(path=folder)
+def extract_document_text(name: str, file_bytes: bytes) -> Optional[Tuple[str, Optional[str]]]:
+    """(document_type, text) for supported files, None otherwise; text None on failure."""
+    return extract_documents([(name, file_bytes)])[0]
 
-    documents: List[Dict] = []
 
-    for obj in result:
-        name = obj["name"]
+def index_document(company_id: int, path: str, file_bytes: bytes) -> None:
+    """Called at upload time; extraction happens once per stored object."""
+    extracted = extract_document_text(path, file_bytes)
+    if extracted is None:
+        return
+    doc_type, text = extracted
+    if text is None:
+        # not indexed: the job fails and the next sync retries the object
+        raise RuntimeError(f"Text extraction failed or timed out: {path}")
+    DOCUMENT_INDEX.add(company_id, path, doc_type, text)
 
-        if not (name.endswith(".txt") or name.endswith(".pdf")):
-            continue
 
-        path = f"{folder}/{name}"
+# ======================================================
+# STORAGE SYNC (MANIFEST DIFF)
+# ======================================================
 
-        file_bytes = supabase.storage.from_("company_docs").download(path)
-
-        if name.endswith(".pdf"):
-            text = _extract_text_from_pdf(file_bytes)
-            doc_type = "pdf"
-        else:
-            text = _extract_text_from_txt(file_bytes)
-            doc_type = "txt"
+def _unchanged(known: Optional[Dict], obj: StorageObject) -> bool:
+    if known is None:
+        return False
+    if not known["indexed"]:
+        # e.g. the upload's indexing job failed: the row alone proves nothing
+        return False
+    if known["etag"] is None:
+        # indexed straight from the upload endpoint, not listed yet
+        return known["size"] == obj.size
+    return (
+        known["etag"] == obj.etag
+        and known["size"] == obj.size
+        and known["updated_at"] == obj.updated_at
+    )
+
+
+def _sync_from_storage(company_id: int) -> None:
+    """
+    One list call, then download + extract only objects that are new or
+    whose size / updated_at / ETag moved; vanished objects leave the index.
+    """
+    storage = get_document_storage()
+    folder = str(company_id)
 
-        documents.append({
-            "document_id": path,
-            "document_type": doc_type,
-            "raw_text": text,
-        })
+    listed = [
+        o for o in storage.list(folder)
+        if o.name.endswith(SUPPORTED_EXTENSIONS)
+    ]
+    known = DOCUMENT_INDEX.manifest(company_id)
 
-    return documents
+    changed = [o for o in listed if not _unchanged(known.get(o.name), o)]
+    listed_names = {o.name for o in listed}
+    removed = [k["document_id"] for name, k in known.items() if name not in listed_names]
 
+    with ThreadPoolExecutor(max_workers=DOWNLOAD_CONCURRENCY) as pool:
+        blobs = list(pool.map(lambda o: (o.name, storage.download(f"{folder}/{o.name}")), changed))
 
-def _basic_match(
-    text: str,
+    # changed PDFs are extracted in parallel in the process pool
+    documents: List[Dict] = []
+    failed = set()
+    for o, (doc_type, text) in zip(changed, extract_documents(blobs)):
+        if text is None:
+            failed.add(o.name)
+            continue
+        documents.append(
+            {"document_id": f"{folder}/{o.name}", "document_type": doc_type, "raw_text": text}
+        )
+
+    # a failed object keeps its previous manifest row (or none), so the
+    # next sync still sees it as changed and retries it
+    entries = [
+        {
+            "name": o.name,
+            "document_id": f"{folder}/{o.name}",
+            "size": o.size,
+            "updated_at": o.updated_at,
+            "etag": o.etag,
+        }
+        for o in listed
+        if o.name not in failed
+    ]
+    entries.extend(
+        {"name": name, **known[name]}
+        for name in failed
+        if name in known
+    )
+
+    DOCUMENT_INDEX.apply_sync(company_id, documents, entries, removed)
+
+    if changed or removed:
+        VECTOR_INDEX.refresh(company_id)
+        logger.info(
+            "Document index synced | company=%s | listed=%d | fetched=%d | failed=%d | removed=%d",
+            company_id, len(listed), len(changed), len(failed), len(removed),
+        )
+
+
+def sync_company_documents(company_id: int, force: bool = False) -> None:
+    """Re-list storage at most every DOCUMENT_MANIFEST_TTL_SECONDS (uploads reset it)."""
+    ttl = settings.DOCUMENT_MANIFEST_TTL_SECONDS
+
+    def _fresh() -> bool:
+        return not force and time.time() - DOCUMENT_INDEX.synced_at(company_id) < ttl
+
+    if _fresh():
+        return
+    with _sync_lock(company_id):
+        if not _fresh():
+            _sync_from_storage(company_id)
+
+
+# ======================================================
+# SEARCH (FTS5 / BM25)
+# ======================================================
+
+def build_match_query(drug: Optional[str], conditions: List[str]) -> Optional[str]:
+    """
+    drug AND (condition OR synonym ...), each term matched as a phrase.
+    e.g. "metformin" AND ("nash" OR "fatty liver")
+    """
+    parts = []
+    if drug and drug.strip():
+        parts.append(fts_phrase(drug))
+
+    conditions = [c for c in conditions if c and c.strip()]
+    if conditions:
+        parts.append(fts_any(conditions))
+
+    return " AND ".join(parts) or None
+
+
+def _semantic_hits(
+    company_id: int,
     drug: Optional[str],
-    condition: Optional[str]
-) -> bool:
-    t = _normalize(text)
-
-    if drug and drug.lower() not in t:
-        return False
+    conditions: List[str],
+    k: int,
+) -> List[int]:
+    """Vector recall: one query per drug/condition pair, batched; best score wins."""
+    if drug and conditions:
+        queries = [f"{drug} {c}" for c in conditions]
+    else:
+        queries = [t for t in [drug, *conditions] if t and t.strip()]
 
-    if condition and condition.lower() not in t:
-        return False
+    best: Dict[int, float] = {}
+    for hits in VECTOR_INDEX.search(company_id, queries, k):
+        for pid, score in hits:
+            if score >= SEMANTIC_MIN_SCORE and score > best.get(pid, 0.0):
+                best[pid] = score
 
-    return True
+    return sorted(best, key=best.get, reverse=True)[:k]
 
 
-def retrieve_candidate_documents(
+def _fuse(
+    company_id: int,
+    lexical: List[Dict],
+    semantic: List[int],
+    limit: int,
+) -> List[Dict]:
+    fused: Dict[int, float] = {}
+    sources: Dict[int, List[str]] = {}
+
+    for source, ids in (("lexical", [p["passage_id"] for p in lexical]), ("semantic", semantic)):
+        for rank, pid in enumerate(ids):
+            fused[pid] = fused.get(pid, 0.0) + 1.0 / (RRF_K + rank + 1)
+            sources.setdefault(pid, []).append(source)
+
+    top = sorted(fused, key=fused.get, reverse=True)[:limit]
+
+    passages = {p["passage_id"]: p for p in lexical}
+    missing = [pid for pid in top if pid not in passages]
+    passages.update(DOCUMENT_INDEX.passages_by_id(company_id, missing))
+
+    # 1.0 = ranked first by both retrievers
+    best_possible = 2.0 / (RRF_K + 1)
+    return [
+        {
+            **passages[pid],
+            "score": fused[pid] / best_possible,
+            "match": "+".join(sources[pid]),
+        }
+        for pid in top
+        if pid in passages
+    ]
+
+
+def search_passages(
     company_id: int,
     drug: Optional[str],
-    condition: Optional[str]
+    conditions: List[str],
+    limit: int = MAX_PASSAGES,
 ) -> List[Dict]:
+    """
+    Best passages across all matching documents, not whole documents.
+
+    BM25 over documents that contain the drug and a condition, fused with
+    TF-IDF/LSA vector recall that also finds passages using other names.
+    """
+    match = build_match_query(drug, conditions)
+    if match is None:
+        return []
+
+    sync_company_documents(company_id)
 
-    documents = _load_documents(company_id)
-    results: List[Dict] = []
+    terms = [t for t in [drug, *conditions] if t and t.strip()]
+    lexical = DOCUMENT_INDEX.search_passages(company_id, match, fts_any(terms), limit * 2)
 
-    for doc in documents:
-        if _basic_match(doc["raw_text"], drug, condition):
-            results.append({
-                **doc,
-                "confidence": "high"
-            })
+    if not settings.VECTOR_SEARCH_ENABLED:
+        return [{**p, "match": "lexical"} for p in lexical[:limit]]
 
-    return results
+    semantic = _semantic_hits(company_id, drug, conditions, limit * 2)
+    return _fuse(company_id, lexical, semantic, limit)
@@ -1,72 +1,123 @@
 # app/services/market_mock.py
 
-import json
-import re
-import unicodedata
 from pathlib import Path
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Iterable, Sequence, Tuple
+
+from app.config import settings
+from app.services.market_store import (
+    MarketDataError,
+    MarketStore,
+    MarketTable,
+    _norm,
+)
+from app.services.fuzzy_index import TrigramIndex
 
 CURRENT_DIR = Path(__file__).resolve().parent
 APP_DIR = CURRENT_DIR.parent
 
-PAIR_PATH = APP_DIR / "mockdata" / "market_mock.json"
-DRUG_ONLY_PATH = APP_DIR / "mockdata" / "market_drug_only.json"
-CONDITION_ONLY_PATH = APP_DIR / "mockdata" / "market_condition_only.json"
-
+DATA_DIR = Path(settings.MARKET_DATA_DIR) if settings.MARKET_DATA_DIR else APP_DIR / "mockdata"
 
-class MarketMockError(Exception):
-    pass
+PAIR_PATH = DATA_DIR / "market_mock.json"
+DRUG_ONLY_PATH = DATA_DIR / "market_drug_only.json"
+CONDITION_ONLY_PATH = DATA_DIR / "market_condition_only.json"
 
 
-def _norm(text: str) -> str:
-    text = unicodedata.normalize("NFKD", text)
-    text = text.lower()
-    text = re.sub(r"[-–—_/]", " ", text)
-    text = re.sub(r"[^\w\s]", "", text)
-    text = re.sub(r"\s+", " ", text)
-    return text.strip()
-
+class MarketMockError(MarketDataError):
+    pass
 
-def _load(path: Path) -> List[Dict[str, Any]]:
-    try:
-        with path.open("r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception as e:
-        raise MarketMockError(f"Failed to load {path}: {e}") from e
 
+# columnar, memory-mapped, hot-reloaded (see market_store)
+STORE = MarketStore(
+    PAIR_PATH,
+    DRUG_ONLY_PATH,
+    CONDITION_ONLY_PATH,
+    compiled_dir=Path(settings.MARKET_COMPILED_DIR),
+)
 
-PAIR_DATA = _load(PAIR_PATH)
-DRUG_ONLY_DATA = _load(DRUG_ONLY_PATH)
-CONDITION_ONLY_DATA = _load(CONDITION_ONLY_PATH)
+MATCH_THRESHOLD = 0.75
+MAX_KEY_CANDIDATES = 3
 
 
 # --------------------------------------------------
-# LOOKUPS
+# LOOKUPS (EXACT, O(1) ON NORMALIZED KEYS)
 # --------------------------------------------------
 
-def lookup_pair(drug: str, condition: str) -> Optional[Dict[str, Any]]:
-    drug = _norm(drug)
-    condition = _norm(condition)
+def lookup_pairs(pairs: Sequence[Tuple[str, str]]) -> List[Optional[Dict[str, Any]]]:
+    """
+    Batch screening lookup: exact (drug, condition) matches for many pairs,
+    aligned with the input (None where a pair has no row). Rows are
+    gathered from the columnar table in a single pass.
+    """
+    snap = STORE.snapshot()
+    idx = [snap.pair_index.get((_norm(d), _norm(c))) for d, c in pairs]
 
-    for row in PAIR_DATA:
-        if _norm(row["drug_name"]) == drug and _norm(row["condition"]) == condition:
-            return row
-    return None
+    hits = [i for i in idx if i is not None]
+    rows = iter(snap.pair.materialize(hits) if hits else [])
+    return [None if i is None else next(rows) for i in idx]
 
 
-def lookup_drug_only(drug: str) -> Optional[Dict[str, Any]]:
-    drug = _norm(drug)
-
-    for row in DRUG_ONLY_DATA:
-        if _norm(row["drug_name"]) == drug:
-            return row
-    return None
-
-
-def lookup_condition_only(condition: str) -> Optional[Dict[str, Any]]:
-    condition = _norm(condition)
+# --------------------------------------------------
+# RANKED (FUZZY + SYNONYM-AWARE) LOOKUPS
+# --------------------------------------------------
 
-    for row in CONDITION_ONLY_DATA:
-        if _norm(row["condition"]) == condition:
-            return row
-    return None
+def _candidates(index: TrigramIndex, terms: Iterable[str]) -> Dict[str, float]:
+    best: Dict[str, float] = {}
+    for term in terms:
+        for key, score in index.best_matches(
+            _norm(term), MAX_KEY_CANDIDATES, MATCH_THRESHOLD
+        ):
+            best[key] = max(best.get(key, 0.0), score)
+    return best
+
+
+def _keep_best(matches: Dict[int, float], row_idx: int, score: float) -> None:
+    # several synonyms can land on the same row → keep its best score
+    if score > matches.get(row_idx, -1.0):
+        matches[row_idx] = score
+
+
+def _ranked(table: MarketTable, matches: Dict[int, float]) -> List[Dict[str, Any]]:
+    order: List[Tuple[int, float]] = sorted(matches.items(), key=lambda kv: kv[1], reverse=True)
+    rows = table.materialize(i for i, _ in order)
+    return [{"row": row, "score": round(score, 3)} for row, (_, score) in zip(rows, order)]
+
+
+def rank_pair_matches(drug: str, conditions: List[str]) -> List[Dict[str, Any]]:
+    """
+    Input  : drug, conditions (the synonym set from expand_condition)
+    Output : [{"row": <market row>, "score": 0..1}, ...] best first;
+             the pair score is drug × condition similarity and must itself
+             reach MATCH_THRESHOLD
+    """
+    snap = STORE.snapshot()
+    drugs = _candidates(snap.drug_keys, [drug])
+    conds = _candidates(snap.condition_keys, conditions)
+
+    matches: Dict[int, float] = {}
+    for d, d_score in drugs.items():
+        for c, c_score in conds.items():
+            i = snap.pair_index.get((d, c))
+            score = d_score * c_score
+            if i is not None and score >= MATCH_THRESHOLD:
+                _keep_best(matches, i, score)
+    return _ranked(snap.pair, matches)
+
+
+def rank_drug_matches(drug: str) -> List[Dict[str, Any]]:
+    snap = STORE.snapshot()
+    matches: Dict[int, float] = {}
+    for d, score in _candidates(snap.drug_keys, [drug]).items():
+        i = snap.drug_only_index.get((d,))
+        if i is not None:
+            _keep_best(matches, i, score)
+    return _ranked(snap.drug_only, matches)
+
+
+def rank_condition_matches(conditions: List[str]) -> List[Dict[str, Any]]:
+    snap = STORE.snapshot()
+    matches: Dict[int, float] = {}
+    for c, score in _candidates(snap.condition_keys, conditions).items():
+        i = snap.condition_only_index.get((c,))
+        if i is not None:
+            _keep_best(matches, i, score)
+    return _ranked(snap.condition_only, matches)
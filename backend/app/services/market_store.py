@@ -0,0 +1,344 @@
+# app/services/market_store.py
+
+"""
+Columnar, memory-mapped market dataset with atomic hot reload.
+
+Each dataset (pair / drug-only / condition-only) is compiled from its JSON
+source into two NumPy files:
+
+  <name>.rows.npy  structured array: numeric columns + (offset, length)
+                   pointers for every string column
+  <name>.blob.npy  uint8 array holding all UTF-8 string bytes back to back
+  <name>.source.npy  (st_mtime_ns, st_size) of the JSON it was compiled
+                   from; any difference triggers a recompile, so a source
+                   replaced by an older file is picked up too
+
+Both are opened with mmap_mode="r", so rows cost no Python objects until a
+lookup materializes them. The store re-stats its sources at most every
+RELOAD_CHECK_SECONDS; when a file changed it recompiles, builds a complete
+new snapshot and swaps it in with a single reference assignment — readers
+holding the old snapshot are unaffected.
+"""
+
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.fuzzy_index import TrigramIndex
+
+logger = logging.getLogger("market-store")
+
+RELOAD_CHECK_SECONDS = 5.0
+
+NUMERIC_FIELDS = (
+    "global_market_size_usd_bn",
+    "forecast_market_size_usd_bn_2030",
+    "cagr_percent",
+    "patient_population_millions",
+    "treated_population_percent",
+)
+INT_FIELDS = ("number_of_competitors",)
+TEXT_FIELDS = ("drug_name", "condition", "branded_vs_generic_mix")
+LIST_FIELDS = ("key_competitor_classes", "commercial_signals", "risks")
+KEY_FIELDS = ("drug_key", "condition_key")
+
+STRING_FIELDS = TEXT_FIELDS + LIST_FIELDS + KEY_FIELDS
+LIST_SEP = "\x1f"
+
+ROW_DTYPE = np.dtype(
+    [(f, "<f8") for f in NUMERIC_FIELDS]
+    + [(f, "<i8") for f in INT_FIELDS]
+    + [(f"{f}_off", "<i8") for f in STRING_FIELDS]
+    + [(f"{f}_len", "<i4") for f in STRING_FIELDS]
+)
+
+
+class MarketDataError(Exception):
+    pass
+
+
+_SEP_RE = re.compile(r"[-–—_/]")
+_PUNCT_RE = re.compile(r"[^\w\s]")
+_WS_RE = re.compile(r"\s+")
+
+
+def _norm(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text)
+    text = text.lower()
+    text = _SEP_RE.sub(" ", text)
+    text = _PUNCT_RE.sub("", text)
+    text = _WS_RE.sub(" ", text)
+    return text.strip()
+
+
+# --------------------------------------------------
+# COMPILE (JSON → columnar .npy)
+# --------------------------------------------------
+
+def compile_rows(rows: List[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray]:
+    table = np.zeros(len(rows), dtype=ROW_DTYPE)
+    blob = bytearray()
+
+    for i, row in enumerate(rows):
+        for f in NUMERIC_FIELDS:
+            value = row.get(f)
+            table[f][i] = np.nan if value is None else float(value)
+        for f in INT_FIELDS:
+            value = row.get(f)
+            table[f][i] = -1 if value is None else int(value)
+
+        strings = {f: row.get(f) or "" for f in TEXT_FIELDS}
+        strings.update({f: LIST_SEP.join(row.get(f) or []) for f in LIST_FIELDS})
+        strings["drug_key"] = _norm(strings["drug_name"])
+        strings["condition_key"] = _norm(strings["condition"])
+
+        for f in STRING_FIELDS:
+            data = strings[f].encode("utf-8")
+            table[f"{f}_off"][i] = len(blob)
+            table[f"{f}_len"][i] = len(data)
+            blob.extend(data)
+
+    return table, np.frombuffer(bytes(blob), dtype=np.uint8)
+
+
+def _save_atomic(path: Path, array: np.ndarray) -> None:
+    # unique temp name: several API workers may recompile at once
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def source_stamp(source: Path) -> Tuple[int, int]:
+    """(st_mtime_ns, st_size) of a dataset source, (0, 0) when missing."""
+    try:
+        st = source.stat()
+    except FileNotFoundError:
+        return (0, 0)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def compile_market_file(source: Path, target_dir: Path) -> Tuple[Path, Path]:
+    """Compile one JSON dataset into <target_dir>/<stem>.rows.npy / .blob.npy."""
+    # stamped before reading: a change mid-read shows up as a new stamp
+    stamp = source_stamp(source)
+    try:
+        with source.open("r", encoding="utf-8") as f:
+            rows = json.load(f)
+    except Exception as e:
+        raise MarketDataError(f"Failed to load {source}: {e}") from e
+
+    try:
+        if not isinstance(rows, list):
+            raise TypeError("top-level JSON value is not a list")
+        table, blob = compile_rows(rows)
+    except Exception as e:
+        # non-dict rows, non-numeric figures, ...
+        raise MarketDataError(f"Invalid market data in {source}: {e}") from e
+
+    rows_path = target_dir / f"{source.stem}.rows.npy"
+    blob_path = target_dir / f"{source.stem}.blob.npy"
+    try:
+        target_dir.mkdir(parents=True, exist_ok=True)
+        # blob first: a reader never sees new offsets over an old blob
+        _save_atomic(blob_path, blob)
+        _save_atomic(rows_path, table)
+        _save_atomic(target_dir / f"{source.stem}.source.npy", np.array(stamp, dtype=np.int64))
+    except OSError as e:
+        raise MarketDataError(f"Failed to write compiled {source.stem}: {e}") from e
+    return rows_path, blob_path
+
+
+# --------------------------------------------------
+# TABLE / SNAPSHOT
+# --------------------------------------------------
+
+class MarketTable:
+    def __init__(self, rows: np.ndarray, blob: np.ndarray):
+        self.rows = rows
+        self.blob = blob
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def _str(self, rec: np.void, field: str) -> str:
+        off = int(rec[f"{field}_off"])
+        return bytes(self.blob[off:off + int(rec[f"{field}_len"])]).decode("utf-8")
+
+    def keys(self, field: str) -> List[str]:
+        return [self._str(rec, field) for rec in self.rows]
+
+    def materialize(self, idx: Iterable[int]) -> List[Dict[str, Any]]:
+        # one fancy-index gather, then build the legacy row dicts
+        records = self.rows[np.fromiter(idx, dtype=np.int64)]
+        out: List[Dict[str, Any]] = []
+        for rec in records:
+            row: Dict[str, Any] = {}
+            for f in ("drug_name", "condition"):
+                value = self._str(rec, f)
+                if value:
+                    row[f] = value
+            for f in NUMERIC_FIELDS:
+                value = float(rec[f])
+                row[f] = None if np.isnan(value) else value
+            for f in INT_FIELDS:
+                value = int(rec[f])
+                row[f] = None if value < 0 else value
+            row["branded_vs_generic_mix"] = self._str(rec, "branded_vs_generic_mix")
+            for f in LIST_FIELDS:
+                value = self._str(rec, f)
+                row[f] = value.split(LIST_SEP) if value else []
+            out.append(row)
+        return out
+
+    def row(self, i: int) -> Dict[str, Any]:
+        return self.materialize([i])[0]
+
+
+def _open_table(rows_path: Path, blob_path: Path) -> MarketTable:
+    return MarketTable(
+        np.load(rows_path, mmap_mode="r"),
+        np.load(blob_path, mmap_mode="r"),
+    )
+
+
+def _key_index(keys: List[Tuple[str, ...]]) -> Dict[Tuple[str, ...], int]:
+    index: Dict[Tuple[str, ...], int] = {}
+    for i, key in enumerate(keys):
+        index.setdefault(key, i)  # first row wins
+    return index
+
+
+class MarketSnapshot:
+    """Immutable view of all three datasets plus their lookup indexes."""
+
+    def __init__(self, pair: MarketTable, drug_only: MarketTable, condition_only: MarketTable):
+        self.pair = pair
+        self.drug_only = drug_only
+        self.condition_only = condition_only
+
+        pair_drugs = pair.keys("drug_key")
+        pair_conds = pair.keys("condition_key")
+        drug_keys = drug_only.keys("drug_key")
+        cond_keys = condition_only.keys("condition_key")
+
+        self.pair_index = _key_index(list(zip(pair_drugs, pair_conds)))
+        self.drug_only_index = _key_index([(k,) for k in drug_keys])
+        self.condition_only_index = _key_index([(k,) for k in cond_keys])
+
+        self.drug_keys = TrigramIndex(pair_drugs + drug_keys)
+        self.condition_keys = TrigramIndex(pair_conds + cond_keys)
+
+
+# --------------------------------------------------
+# STORE (HOT RELOAD)
+# --------------------------------------------------
+
+class MarketStore:
+    def __init__(
+        self,
+        pair_source: Path,
+        drug_only_source: Path,
+        condition_only_source: Path,
+        compiled_dir: Path,
+        check_interval: float = RELOAD_CHECK_SECONDS,
+    ):
+        self.sources = {
+            "pair": pair_source,
+            "drug_only": drug_only_source,
+            "condition_only": condition_only_source,
+        }
+        self.compiled_dir = compiled_dir
+        self.check_interval = check_interval
+
+        self._snapshot: Optional[MarketSnapshot] = None
+        self._versions: Dict[str, Tuple[Tuple[int, int], float]] = {}
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def _compiled_paths(self, source: Path) -> Tuple[Path, Path]:
+        return (
+            self.compiled_dir / f"{source.stem}.rows.npy",
+            self.compiled_dir / f"{source.stem}.blob.npy",
+        )
+
+    def _mtime(self, path: Path) -> float:
+        try:
+            return path.stat().st_mtime
+        except FileNotFoundError:
+            return 0.0
+
+    def _version(self, source: Path) -> Tuple[Tuple[int, int], float]:
+        rows_path, _ = self._compiled_paths(source)
+        return (source_stamp(source), self._mtime(rows_path))
+
+    def _compiled_stamp(self, source: Path) -> Optional[Tuple[int, int]]:
+        try:
+            stamp = np.load(self.compiled_dir / f"{source.stem}.source.npy")
+            return (int(stamp[0]), int(stamp[1]))
+        except Exception:
+            return None
+
+    def _load_table(self, source: Path) -> MarketTable:
+        rows_path, blob_path = self._compiled_paths(source)
+        if (
+            self._compiled_stamp(source) != source_stamp(source)
+            or not rows_path.exists()
+            or not blob_path.exists()
+        ):
+            logger.info("Compiling market dataset → %s", source.name)
+            compile_market_file(source, self.compiled_dir)
+        try:
+            return _open_table(rows_path, blob_path)
+        except Exception as e:
+            # e.g. a compiled file another worker is still replacing
+            raise MarketDataError(f"Failed to open compiled {source.stem}: {e}") from e
+
+    def reload(self) -> MarketSnapshot:
+        with self._lock:
+            snapshot = MarketSnapshot(
+                pair=self._load_table(self.sources["pair"]),
+                drug_only=self._load_table(self.sources["drug_only"]),
+                condition_only=self._load_table(self.sources["condition_only"]),
+            )
+            self._versions = {n: self._version(p) for n, p in self.sources.items()}
+            self._snapshot = snapshot  # atomic swap
+            self._next_check = time.monotonic() + self.check_interval
+        return snapshot
+
+    def _changed(self) -> bool:
+        return any(
+            self._version(path) != self._versions.get(name)
+            for name, path in self.sources.items()
+        )
+
+    def snapshot(self) -> MarketSnapshot:
+        snapshot = self._snapshot
+        if snapshot is None:
+            return self.reload()
+
+        if time.monotonic() >= self._next_check:
+            self._next_check = time.monotonic() + self.check_interval
+            if self._changed():
+                try:
+                    return self.reload()
+                except MarketDataError:
+                    # keep serving the last good snapshot
+                    logger.exception("Market data reload failed")
+        return snapshot
@@ -0,0 +1,84 @@
+# app/services/near_duplicates.py
+
+import hashlib
+import re
+from collections import Counter
+from typing import Dict, List
+
+SIMHASH_BITS = 64
+DEFAULT_MAX_DISTANCE = 6  # tuned for short title + snippet texts
+MIN_TOKENS = 4
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def _features(text: str) -> Counter:
+    # unigrams only: on snippet-length texts shingles make near copies drift apart
+    return Counter(_TOKEN_RE.findall(text.lower()))
+
+
+def _hash64(feature: str) -> int:
+    return int.from_bytes(
+        hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(),
+        "big",
+    )
+
+
+def simhash(text: str) -> int:
+    weights = [0] * SIMHASH_BITS
+    for feature, count in _features(text).items():
+        h = _hash64(feature)
+        for bit in range(SIMHASH_BITS):
+            if (h >> bit) & 1:
+                weights[bit] += count
+            else:
+                weights[bit] -= count
+
+    value = 0
+    for bit, w in enumerate(weights):
+        if w > 0:
+            value |= 1 << bit
+    return value
+
+
+class SimHashIndex:
+    """
+    Streaming near-duplicate filter over 64-bit SimHash fingerprints.
+
+    Fingerprints are split into (max_distance + 1) bands; two fingerprints
+    within `max_distance` bits must agree on at least one band, so only
+    same-band candidates are compared.
+    """
+
+    def __init__(self, max_distance: int = DEFAULT_MAX_DISTANCE):
+        self.max_distance = max_distance
+        self._bands = max_distance + 1
+        self._band_bits = SIMHASH_BITS // self._bands
+        self._band_mask = (1 << self._band_bits) - 1
+        self._buckets: List[Dict[int, List[int]]] = [{} for _ in range(self._bands)]
+
+    def _band_keys(self, fingerprint: int) -> List[int]:
+        return [
+            (fingerprint >> (i * self._band_bits)) & self._band_mask
+            for i in range(self._bands)
+        ]
+
+    def is_duplicate(self, fingerprint: int) -> bool:
+        for bucket, key in zip(self._buckets, self._band_keys(fingerprint)):
+            for other in bucket.get(key, ()):
+                if (fingerprint ^ other).bit_count() <= self.max_distance:
+                    return True
+        return False
+
+    def add(self, text: str) -> bool:
+        """Register `text`; returns False if it near-duplicates an earlier entry."""
+        if len(_TOKEN_RE.findall(text.lower())) < MIN_TOKENS:
+            return True  # too short to fingerprint reliably
+
+        fingerprint = simhash(text)
+        if self.is_duplicate(fingerprint):
+            return False
+
+        for bucket, key in zip(self._buckets, self._band_keys(fingerprint)):
+            bucket.setdefault(key, []).append(fingerprint)
+        return True
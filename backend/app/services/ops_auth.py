@@ -1,35 +1,113 @@
+import asyncio
+import logging
+import threading
 import time
 import requests
 from typing import Optional
 from app.config import settings
 
+logger = logging.getLogger("ops-auth")
+
 OPS_TOKEN_URL = "https://ops.epo.org/3.2/auth/accesstoken"
 USER_AGENT = "NovusAI/1.0 (contact: research@novusai.local)"
 
-_access_token: Optional[str] = None
-_token_expiry_ts: float = 0.0
-
-
-def get_access_token() -> str:
-    global _access_token, _token_expiry_ts
-
-    now = time.time()
-    if _access_token and now < _token_expiry_ts - 60:
-        return _access_token
-
-    resp = requests.post(
-        OPS_TOKEN_URL,
-        auth=(settings.CONSUMER_KEY, settings.CONSUMER_SECRET),
-        headers={
-            "User-Agent": USER_AGENT,
-            "Content-Type": "application/x-www-form-urlencoded",
-        },
-        data={"grant_type": "client_credentials"},
-        timeout=20,
-    )
-    resp.raise_for_status()
-
-    data = resp.json()
-    _access_token = data["access_token"]
-    _token_expiry_ts = now + int(data.get("expires_in", 1200))
-    return _access_token
+# foreground callers treat a token as expired this long before OPS does
+EXPIRY_MARGIN_SEC = 60
+# the background refresh fires this long before expiry, ahead of the margin
+PROACTIVE_REFRESH_SEC = 180
+BACKGROUND_RETRY_SEC = 30
+
+
+class OpsTokenManager:
+    """
+    Single-flight OPS access token holder.
+
+    - at most one token POST is in flight; threads that arrive while it
+      runs wait on the lock and reuse its result
+    - a daemon timer renews the token before it expires, so user requests
+      normally never pay for the refresh
+    - force_refresh(rejected) after a 401 refreshes only if nobody has
+      replaced the rejected token yet → concurrent 401s cost one POST
+    """
+
+    def __init__(self):
+        self._token: Optional[str] = None
+        self._expiry_ts: float = 0.0
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+
+    def _valid(self) -> bool:
+        return bool(self._token) and time.time() < self._expiry_ts - EXPIRY_MARGIN_SEC
+
+    def _request_token(self) -> None:
+        resp = requests.post(
+            OPS_TOKEN_URL,
+            auth=(settings.CONSUMER_KEY, settings.CONSUMER_SECRET),
+            headers={
+                "User-Agent": USER_AGENT,
+                "Content-Type": "application/x-www-form-urlencoded",
+            },
+            data={"grant_type": "client_credentials"},
+            timeout=20,
+        )
+        resp.raise_for_status()
+
+        data = resp.json()
+        self._token = data["access_token"]
+        self._expiry_ts = time.time() + int(data.get("expires_in", 1200))
+        self._schedule(self._expiry_ts - PROACTIVE_REFRESH_SEC - time.time())
+
+    def _refresh(self, stale: Optional[str], force: bool = False) -> str:
+        with self._lock:
+            # someone else already replaced the token we saw
+            if self._token != stale and self._valid():
+                return self._token
+            if not force and self._valid():
+                return self._token
+            self._request_token()
+            return self._token
+
+    # ---------------------------
+    # BACKGROUND REFRESH
+    # ---------------------------
+
+    def _schedule(self, delay: float) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(max(delay, 1.0), self._background_refresh)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _background_refresh(self) -> None:
+        try:
+            self._refresh(self._token, force=True)
+        except Exception:
+            logger.warning("Background OPS token refresh failed", exc_info=True)
+            with self._lock:
+                self._schedule(BACKGROUND_RETRY_SEC)
+
+    # ---------------------------
+    # PUBLIC API
+    # ---------------------------
+
+    def get_token(self) -> str:
+        token = self._token
+        if token and self._valid():
+            return token
+        return self._refresh(token)
+
+    def force_refresh(self, rejected: str) -> str:
+        return self._refresh(rejected, force=True)
+
+    async def get_token_async(self) -> str:
+        token = self._token
+        if token and self._valid():
+            return token
+        # blocking POST + lock wait happen off the event loop
+        return await asyncio.to_thread(self.get_token)
+
+    async def force_refresh_async(self, rejected: str) -> str:
+        return await asyncio.to_thread(self.force_refresh, rejected)
+
+
+OPS_TOKENS = OpsTokenManager()
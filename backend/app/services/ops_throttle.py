@@ -0,0 +1,160 @@
+# app/services/ops_throttle.py
+
+"""
+Adaptive EPO OPS request pacing.
+
+Every OPS response carries the caller's quota state, e.g.
+
+    X-Throttling-Control: busy (images=green:200, inpadoc=green:60,
+                                other=green:1000, retrieval=yellow:100,
+                                search=green:30)
+    X-IndividualQuotaPerHour-Used: 1234567
+
+Per service the colour says how close we are to the limit and the number
+is the allowed requests per minute. Pacing is derived from the last seen
+state: no delay while green and the system is idle, spaced at the allowed
+rate on yellow, slower on red, and a hard pause on black or a 403
+throttling rejection.
+"""
+
+import asyncio
+import logging
+import re
+import threading
+import time
+from typing import Dict, Mapping, Optional
+
+logger = logging.getLogger("ops-throttle")
+
+SERVICES = ("search", "retrieval", "inpadoc", "images", "other")
+
+# share of the per-minute allowance we pace to, by colour
+COLOR_FACTOR = {
+    "green": 0.0,
+    "yellow": 1.0,
+    "red": 2.0,
+}
+# green pacing still slows down when the whole platform is under load
+SYSTEM_FACTOR = {
+    "idle": 0.0,
+    "busy": 0.5,
+    "overloaded": 1.0,
+}
+
+BLACK_PAUSE_SEC = 60.0
+MAX_BACKOFF_SEC = 60.0
+INITIAL_BACKOFF_SEC = 2.0
+
+# fair-use hourly volume; past this share we pace as if the service were red
+INDIVIDUAL_HOURLY_QUOTA_BYTES = 450 * 1024 * 1024
+HOURLY_QUOTA_SLOWDOWN_RATIO = 0.8
+
+_SERVICE_RE = re.compile(r"(\w+)=(\w+):(\d+)")
+
+
+class _ServiceState:
+    __slots__ = ("color", "per_minute", "next_allowed", "backoff")
+
+    def __init__(self):
+        self.color = "green"
+        self.per_minute = 0
+        self.next_allowed = 0.0
+        self.backoff = INITIAL_BACKOFF_SEC
+
+
+class OpsThrottle:
+    def __init__(self):
+        self._services: Dict[str, _ServiceState] = {s: _ServiceState() for s in SERVICES}
+        self._system = "idle"
+        self._hourly_used = 0
+        self._lock = threading.Lock()
+
+    # ---------------------------
+    # STATE UPDATES
+    # ---------------------------
+
+    def update(self, headers: Mapping[str, str]) -> None:
+        control = headers.get("X-Throttling-Control")
+        used = headers.get("X-IndividualQuotaPerHour-Used")
+
+        with self._lock:
+            if control:
+                self._system = control.split("(", 1)[0].strip().lower() or "idle"
+                for service, color, per_minute in _SERVICE_RE.findall(control):
+                    state = self._services.setdefault(service, _ServiceState())
+                    state.color = color.lower()
+                    state.per_minute = int(per_minute)
+                    if state.color == "black":
+                        state.next_allowed = max(
+                            state.next_allowed, time.monotonic() + BLACK_PAUSE_SEC
+                        )
+
+            if used and used.isdigit():
+                self._hourly_used = int(used)
+
+    def on_success(self, service: str) -> None:
+        with self._lock:
+            self._state(service).backoff = INITIAL_BACKOFF_SEC
+
+    def on_throttled(self, service: str, retry_after: Optional[str] = None) -> float:
+        """403 throttling rejection → pause the service, doubling on repeats."""
+        with self._lock:
+            state = self._state(service)
+            pause = state.backoff
+            if retry_after and retry_after.isdigit():
+                pause = max(pause, float(retry_after))
+            state.next_allowed = max(state.next_allowed, time.monotonic() + pause)
+            state.backoff = min(state.backoff * 2, MAX_BACKOFF_SEC)
+
+        logger.warning("OPS throttled | service=%s | pause=%.1fs", service, pause)
+        return pause
+
+    # ---------------------------
+    # PACING
+    # ---------------------------
+
+    def _state(self, service: str) -> _ServiceState:
+        return self._services.setdefault(service, _ServiceState())
+
+    def _interval(self, state: _ServiceState) -> float:
+        if state.color == "black":
+            return BLACK_PAUSE_SEC
+        if not state.per_minute:
+            return 0.0
+
+        factor = COLOR_FACTOR.get(state.color, 1.0)
+        if state.color == "green":
+            factor = SYSTEM_FACTOR.get(self._system, 1.0)
+        if self._hourly_used >= INDIVIDUAL_HOURLY_QUOTA_BYTES * HOURLY_QUOTA_SLOWDOWN_RATIO:
+            factor = max(factor, COLOR_FACTOR["red"])
+
+        return factor * 60.0 / state.per_minute
+
+    def reserve(self, service: str) -> float:
+        """Claim the next slot for `service`; returns seconds to wait before sending."""
+        with self._lock:
+            state = self._state(service)
+            now = time.monotonic()
+            start = max(now, state.next_allowed)
+            state.next_allowed = start + self._interval(state)
+        return start - now
+
+    def wait(self, service: str) -> None:
+        delay = self.reserve(service)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def wait_async(self, service: str) -> None:
+        delay = self.reserve(service)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def is_throttling_rejection(status_code: int, headers: Mapping[str, str], body: str = "") -> bool:
+    if status_code != 403:
+        return False
+    reason = headers.get("X-Rejection-Reason", "")
+    return bool(reason) or "quota" in body.lower() or "throttl" in body.lower()
+
+
+OPS_THROTTLE = OpsThrottle()
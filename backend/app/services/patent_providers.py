@@ -0,0 +1,233 @@
+# app/services/patent_providers.py
+
+"""
+Patent search backends behind one interface.
+
+- "ops"   : live EPO OPS search (patent_service), needs CONSUMER_KEY/SECRET
+- "local" : in-memory index over the bundled mockdata/patentmock*.json,
+            with an optional simulated latency profile for load tests
+
+Selected with PATENT_PROVIDER; callers only see PatentRecord lists.
+"""
+
+import asyncio
+import heapq
+import json
+import logging
+import random
+import re
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Protocol, Set
+
+from app.config import settings
+from app.services.patent_service import (
+    MAX_FINAL_PATENTS,
+    PatentRecord,
+    search_patents,
+)
+
+logger = logging.getLogger("patent-providers")
+
+CURRENT_DIR = Path(__file__).resolve().parent
+APP_DIR = CURRENT_DIR.parent
+
+DATA_DIR = Path(settings.PATENT_DATA_DIR) if settings.PATENT_DATA_DIR else APP_DIR / "mockdata"
+
+TOPIC_PATH = DATA_DIR / "patentmock.json"
+DRUG_PATH = DATA_DIR / "patentmock_drug.json"
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_COUNTRY_RE = re.compile(r"^[A-Z]{2}")
+
+
+class PatentProvider(Protocol):
+    name: str
+
+    async def search(
+        self,
+        drug: Optional[str],
+        conditions: List[str],
+        deep_scan: bool = False,
+    ) -> List[PatentRecord]:
+        ...
+
+
+class PatentDataError(Exception):
+    pass
+
+
+def _tokens(text: str) -> Set[str]:
+    return set(_TOKEN_RE.findall(text.lower()))
+
+
+# ======================================================
+# OPS PROVIDER
+# ======================================================
+
+class OpsPatentProvider:
+    name = "ops"
+
+    async def search(
+        self,
+        drug: Optional[str],
+        conditions: List[str],
+        deep_scan: bool = False,
+    ) -> List[PatentRecord]:
+        return await search_patents(drug, conditions, deep_scan)
+
+
+# ======================================================
+# LOCAL PROVIDER
+# ======================================================
+
+class LocalPatentProvider:
+    """
+    Token → document postings over the mock patent files.
+
+    A query ("drug condition") matches documents containing every one of
+    its tokens, the same "ta all" semantics the OPS CQL uses. Matches are
+    ranked newest first like the OPS path.
+    """
+
+    name = "local"
+
+    def __init__(
+        self,
+        paths: Iterable[Path] = (TOPIC_PATH, DRUG_PATH),
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self._records: List[PatentRecord] = []
+        self._postings: Dict[str, Set[int]] = defaultdict(set)
+
+        for path in paths:
+            self._load(Path(path))
+
+        logger.info("Local patent index | %d documents | %d terms",
+                    len(self._records), len(self._postings))
+
+    # ---------------------------
+    # INDEXING
+    # ---------------------------
+
+    def _load(self, path: Path) -> None:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            raise PatentDataError(f"Patent mock file missing: {path}")
+        except json.JSONDecodeError as e:
+            raise PatentDataError(f"Invalid JSON in {path}: {e}")
+
+        if not isinstance(data, dict):
+            raise PatentDataError(f"{path.name} must map a topic or drug to a patent list")
+
+        seen = {r.pub_id for r in self._records}
+        for group, entries in data.items():
+            for entry in entries or []:
+                number = str(entry.get("patent_number", "")).strip()
+                if not number or number in seen:
+                    continue
+                seen.add(number)
+                self._add(group, entry, number)
+
+    def _add(self, group: str, entry: dict, number: str) -> None:
+        title = entry.get("title", "")
+        hints = entry.get("evidence_hints", "")
+        indications = [
+            *entry.get("known_indications", []),
+            *entry.get("candidate_new_indications", []),
+        ]
+
+        country = _COUNTRY_RE.match(number)
+        date = entry.get("grant_date") or entry.get("filing_date") or ""
+
+        record = PatentRecord(
+            pub_id=number,
+            country=country.group(0) if country else "",
+            pub_date=date.replace("-", "") or "00000000",
+            abstract=". ".join(p for p in (title, hints) if p),
+        )
+
+        doc_id = len(self._records)
+        self._records.append(record)
+
+        # group key is the drug (drug file) or the therapeutic area (topic file)
+        text = " ".join([group.replace("_", " "), title, hints, *indications])
+        for token in _tokens(text):
+            self._postings[token].add(doc_id)
+
+    # ---------------------------
+    # SEARCH
+    # ---------------------------
+
+    def _match(self, query: str) -> Set[int]:
+        tokens = _tokens(query)
+        if not tokens:
+            return set()
+        postings = sorted((self._postings.get(t, set()) for t in tokens), key=len)
+        return set.intersection(*postings)
+
+    def search_sync(self, drug: Optional[str], conditions: List[str]) -> List[PatentRecord]:
+        if drug and conditions:
+            queries = [f"{drug} {c}" for c in conditions]
+        elif drug:
+            queries = [drug]
+        else:
+            queries = list(conditions)
+
+        hits: Set[int] = set()
+        for q in queries:
+            if q.strip():
+                hits |= self._match(q)
+
+        return heapq.nlargest(
+            MAX_FINAL_PATENTS,
+            (self._records[i] for i in hits),
+            key=lambda r: r.pub_date,
+        )
+
+    async def _simulate_latency(self) -> None:
+        delay = self.latency_ms
+        if self.jitter_ms:
+            delay += random.uniform(-self.jitter_ms, self.jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000.0)
+
+    async def search(
+        self,
+        drug: Optional[str],
+        conditions: List[str],
+        deep_scan: bool = False,
+    ) -> List[PatentRecord]:
+        await self._simulate_latency()
+        return self.search_sync(drug, conditions)
+
+
+# ======================================================
+# SELECTION
+# ======================================================
+
+_PROVIDER: Optional[PatentProvider] = None
+
+
+def get_patent_provider() -> PatentProvider:
+    global _PROVIDER
+    if _PROVIDER is None:
+        kind = settings.PATENT_PROVIDER.strip().lower()
+        if kind == "local":
+            _PROVIDER = LocalPatentProvider(
+                latency_ms=settings.PATENT_MOCK_LATENCY_MS,
+                jitter_ms=settings.PATENT_MOCK_LATENCY_JITTER_MS,
+            )
+        elif kind == "ops":
+            if not (settings.CONSUMER_KEY and settings.CONSUMER_SECRET):
+                logger.warning("PATENT_PROVIDER=ops without CONSUMER_KEY/CONSUMER_SECRET")
+            _PROVIDER = OpsPatentProvider()
+        else:
+            raise ValueError(f"Unknown PATENT_PROVIDER: {settings.PATENT_PROVIDER!r}")
+        logger.info("Patent provider → %s", _PROVIDER.name)
+    return _PROVIDER
@@ -1,14 +1,31 @@
-import time
-import requests
-from typing import List, Optional
+import asyncio
+import heapq
+import io
+import logging
+from dataclasses import dataclass
+from operator import attrgetter
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
 from lxml import etree
-from app.services.ops_auth import get_access_token
+
+from app.config import settings
+from app.services.ops_auth import OPS_TOKENS
+from app.services.ops_throttle import OPS_THROTTLE, is_throttling_rejection
+from app.services.query_planner import QueryRejected, run_planned_search_async
+from app.services.ttl_cache import SQLiteTTLCache
+
+logger = logging.getLogger("patent-service")
 
 OPS_BASE = "https://ops.epo.org/3.2/rest-services"
+SEARCH_URL = f"{OPS_BASE}/published-data/search/abstract"
 USER_AGENT = "NovusAI/1.0 (contact: research@novusai.local)"
 
-REQUEST_DELAY_SEC = 1.2
+MAX_THROTTLE_RETRIES = 2
 MAX_SEARCH_RESULTS = 50
+MAX_RANGE_SIZE = 100          # OPS hard limit per search request
+MAX_CQL_LENGTH = 400
+DEEP_SCAN_MAX_RESULTS = 500
 MAX_FINAL_PATENTS = 7
 
 NS = {
@@ -16,50 +33,323 @@ NS = {
     "ep": "http://www.epo.org/exchange",
 }
 
-# 🔒 SECURE XML PARSER
-XML_PARSER = etree.XMLParser(
-    resolve_entities=False,
-    no_network=True,
-    recover=True,
-    huge_tree=False
+# OPS quota is weekly → identical CQL searches are answered locally
+_SEARCH_CACHE = SQLiteTTLCache(
+    settings.CACHE_DB_PATH,
+    table="patent_search_pages",
+    ttl_seconds=settings.PATENT_SEARCH_CACHE_TTL_SECONDS,
+)
+_DOCUMENT_CACHE = SQLiteTTLCache(
+    settings.CACHE_DB_PATH,
+    table="patent_documents",
+    ttl_seconds=settings.PATENT_DOCUMENT_CACHE_TTL_SECONDS,
 )
 
-def _sleep():
-    time.sleep(REQUEST_DELAY_SEC)
-
-def _headers() -> dict:
+def _headers(token: str) -> dict:
     return {
-        "Authorization": f"Bearer {get_access_token()}",
+        "Authorization": f"Bearer {token}",
         "User-Agent": USER_AGENT,
         "Accept": "application/xml",
     }
 
-def _perform_search(query: str) -> Optional[str]:
-    if not query.strip():
-        return None
+class _OpsSession:
+    """One search request's HTTP client; the token is only fetched on a cache miss."""
+
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+        self.token: Optional[str] = None
 
-    _sleep()
-    url = f"{OPS_BASE}/published-data/search/abstract"
-    cql = f"ta = {query.strip()}"
+    async def headers(self) -> dict:
+        if self.token is None:
+            self.token = await OPS_TOKENS.get_token_async()
+        return _headers(self.token)
 
+    async def reauthenticate(self, rejected: str) -> None:
+        # single-flight in the manager: concurrent 401s share one refresh
+        self.token = await OPS_TOKENS.force_refresh_async(rejected)
+
+
+async def _get_page(
+    session: _OpsSession,
+    cql: str,
+    start: int,
+    end: int,
+) -> Optional[bytes]:
     params = {
         "q": cql,
-        "Range": f"1-{MAX_SEARCH_RESULTS}",
+        "Range": f"{start}-{end}",
     }
 
+    reauthenticated = False
+
+    for _ in range(MAX_THROTTLE_RETRIES + 1):
+        # pacing adapts to the quota state OPS reported on earlier responses
+        await OPS_THROTTLE.wait_async("search")
+        try:
+            headers = await session.headers()
+            resp = await session.client.get(SEARCH_URL, headers=headers, params=params)
+            if resp.status_code == 401 and not reauthenticated:
+                # token revoked / expired early → exactly one forced refresh + retry
+                reauthenticated = True
+                await session.reauthenticate(session.token)
+                resp = await session.client.get(
+                    SEARCH_URL, headers=await session.headers(), params=params
+                )
+        except Exception:
+            return None
+
+        OPS_THROTTLE.update(resp.headers)
+
+        if not is_throttling_rejection(resp.status_code, resp.headers, resp.text):
+            OPS_THROTTLE.on_success("search")
+            break
+
+        OPS_THROTTLE.on_throttled("search", resp.headers.get("Retry-After"))
+    else:
+        logger.warning("OPS search still throttled after %d retries", MAX_THROTTLE_RETRIES)
+        return None
+
+    if resp.status_code == 404:
+        return b""
+    if resp.status_code in (400, 413):
+        raise QueryRejected(f"HTTP {resp.status_code}")
+    if resp.status_code != 200:
+        logger.warning("OPS search failed | status=%s", resp.status_code)
+        return None
+    return resp.content
+
+
+# ======================================================
+# EXTRACTION (STREAMING XML → SLOTTED RECORDS)
+# ======================================================
+
+@dataclass(slots=True)
+class PatentRecord:
+    pub_id: str
+    country: str
+    pub_date: str
+    abstract: str
+
+    def to_dict(self) -> Dict[str, str]:
+        return {
+            "pub_id": self.pub_id,
+            "country": self.country,
+            "pub_date": self.pub_date,
+            "abstract": self.abstract,
+        }
+
+
+EP_NS = NS["ep"]
+OPS_NS = NS["ops"]
+_DOC_TAG = f"{{{EP_NS}}}exchange-document"
+_SEARCH_TAG = f"{{{OPS_NS}}}biblio-search"
+
+# compiled once, evaluated relative to each exchange-document
+_EN_ABSTRACT_TEXT = etree.XPath(
+    ".//ep:abstract[@lang='en']//ep:p//text()", namespaces=NS
+)
+_HAS_EN_ABSTRACT = etree.XPath(
+    "boolean(.//ep:abstract[@lang='en'])", namespaces=NS
+)
+_PUB_DATE = etree.XPath(
+    ".//ep:publication-reference//ep:date/text()", namespaces=NS
+)
+
+
+def _record_from_element(doc: etree._Element) -> Optional[PatentRecord]:
+    country = doc.get("country")
+    num = doc.get("doc-number")
+    kind = doc.get("kind")
+
+    if not (country and num and kind):
+        return None
+
+    if not _HAS_EN_ABSTRACT(doc):
+        return None
+
+    pub_date = _PUB_DATE(doc)
+    abstract_text = " ".join(t.strip() for t in _EN_ABSTRACT_TEXT(doc) if t.strip())
+
+    return PatentRecord(
+        pub_id=f"{country}{num}{kind}",
+        country=country,
+        pub_date=str(pub_date[0]) if pub_date else "00000000",
+        abstract=abstract_text,
+    )
+
+
+def parse_search_page(xml: bytes) -> Tuple[int, List[PatentRecord]]:
+    """
+    Input  : raw OPS search response
+    Output : (total-result-count, English-abstract records in response order)
+
+    Elements are cleared as soon as their record is extracted, so memory
+    stays flat in the number of documents on the page.
+    """
+    total = 0
+    records: List[PatentRecord] = []
+
+    context = etree.iterparse(
+        io.BytesIO(xml),
+        events=("start", "end"),
+        tag=(_SEARCH_TAG, _DOC_TAG),
+        resolve_entities=False,
+        no_network=True,
+        recover=True,
+        huge_tree=False,
+    )
+
     try:
-        resp = requests.get(url, headers=_headers(), params=params, timeout=30)
-        if resp.status_code == 404:
+        for event, elem in context:
+            if elem.tag == _SEARCH_TAG:
+                if event == "start":
+                    count = elem.get("total-result-count")
+                    total = int(count) if count and count.isdigit() else 0
+                continue
+
+            if event != "end":
+                continue
+
+            record = _record_from_element(elem)
+            if record is not None:
+                records.append(record)
+
+            # free the subtree and the already-processed siblings
+            elem.clear(keep_tail=True)
+            parent = elem.getparent()
+            if parent is not None:
+                while elem.getprevious() is not None:
+                    del parent[0]
+    except etree.XMLSyntaxError:
+        logger.warning("OPS response truncated / malformed; kept %d records", len(records))
+
+    return total, records
+
+
+# ======================================================
+# CACHED SEARCH PAGES
+# ======================================================
+# search entries hold only the ordered publication IDs (+ total count);
+# records live once per document, so overlapping queries share them
+
+def _page_key(cql: str, start: int, end: int) -> str:
+    return f"{cql}|{start}-{end}"
+
+
+def _cached_page(key: str) -> Optional[Dict[str, Any]]:
+    try:
+        entry = _SEARCH_CACHE.get(key)
+        if entry is None:
             return None
-        resp.raise_for_status()
-        return resp.text
+        docs = _DOCUMENT_CACHE.get_many(entry["ids"])
+        if len(docs) < len(entry["ids"]):
+            return None  # a document expired → refetch the page
+        return {
+            "total": entry["total"],
+            "records": [PatentRecord(**docs[i]) for i in entry["ids"]],
+        }
     except Exception:
+        logger.warning("Patent cache read failed", exc_info=True)
+        return None
+
+
+def _store_page(key: str, total: int, records: List[PatentRecord]) -> None:
+    try:
+        _DOCUMENT_CACHE.set_many((r.pub_id, r.to_dict()) for r in records)
+        _SEARCH_CACHE.set(key, {"total": total, "ids": [r.pub_id for r in records]})
+    except Exception:
+        logger.warning("Patent cache write failed", exc_info=True)
+
+
+async def _search_page(
+    session: _OpsSession,
+    cql: str,
+    start: int,
+    end: int,
+) -> Optional[Dict[str, Any]]:
+    key = _page_key(cql, start, end)
+    cached = await asyncio.to_thread(_cached_page, key)
+    if cached is not None:
+        return cached
+
+    xml = await _get_page(session, cql, start, end)
+    if xml is None:
+        return None  # transient failure → not cached
+
+    # b"" = 404, a definitive empty result that is worth caching too
+    total, records = parse_search_page(xml) if xml else (0, [])
+    page = {"total": total, "records": records}
+    await asyncio.to_thread(_store_page, key, page["total"], page["records"])
+    return page
+
+
+async def _perform_search(
+    session: _OpsSession,
+    cql: str,
+    n_terms: int = 1,
+    deep_scan: bool = False,
+) -> Optional[List[PatentRecord]]:
+    if not cql.strip():
+        return None
+
+    # widen the range for combined queries so each synonym keeps its budget
+    first_end = min(MAX_SEARCH_RESULTS * n_terms, MAX_RANGE_SIZE)
+    first = await _search_page(session, cql, 1, first_end)
+    if not first or not first["records"]:
         return None
 
-def search_patents_raw_xml(
+    records = list(first["records"])
+
+    if deep_scan:
+        total = min(first["total"], DEEP_SCAN_MAX_RESULTS)
+        ranges = [
+            (start, min(start + MAX_RANGE_SIZE - 1, total))
+            for start in range(first_end + 1, total + 1, MAX_RANGE_SIZE)
+        ]
+        # remaining ranges from first_end + 1, MAX_RANGE_SIZE at a time, fetched
+        # in parallel: 51-150, 151-250, … for one term; 101-200, … for 2+ terms
+        more = await asyncio.gather(
+            *(_search_page(session, cql, s, e) for s, e in ranges),
+            return_exceptions=True,
+        )
+        for page in more:
+            if isinstance(page, dict):
+                records.extend(page["records"])
+
+    return records
+
+
+def _cql_term(query: str) -> str:
+    return query.strip().replace('"', "")
+
+
+def _render_cql(queries: List[str]) -> str:
+    if len(queries) == 1:
+        return f"ta = {queries[0].strip()}"
+    # one title/abstract clause per synonym, OR-ed into a single CQL query
+    return " or ".join(f'ta all "{_cql_term(q)}"' for q in queries)
+
+
+def _select_documents(record_sets: List[List[PatentRecord]]) -> List[PatentRecord]:
+    seen_ids = set()
+    unique = []
+    for records in record_sets:
+        for r in records:
+            if r.pub_id in seen_ids:
+                continue
+            seen_ids.add(r.pub_id)
+            unique.append(r)
+
+    # heap top-k by publication date instead of sorting every document
+    return heapq.nlargest(MAX_FINAL_PATENTS, unique, key=attrgetter("pub_date"))
+
+
+async def search_patents(
     drug: Optional[str],
     conditions: List[str],
-) -> str:
+    deep_scan: bool = False,
+) -> List[PatentRecord]:
+    """Top English-abstract patents, newest first, as structured records."""
 
     queries = []
 
@@ -71,82 +361,46 @@ def search_patents_raw_xml(
     elif conditions:
         queries.extend(conditions)
 
-    raw_fragments = []
-    for q in queries:
-        xml = _perform_search(q)
-        if xml:
-            raw_fragments.append(xml)
-
-    if not raw_fragments:
-        return "NO PATENTS FOUND."
+    queries = [q for q in queries if q.strip()]
 
-    seen_ids = set()
-    docs_with_pub_date = []
+    async with httpx.AsyncClient(timeout=30) as client:
+        session = _OpsSession(client)
 
-    for fragment in raw_fragments:
-        try:
-            root = etree.fromstring(fragment.encode("utf-8"), parser=XML_PARSER)
-        except Exception:
-            continue
-
-        for doc in root.xpath("//ep:exchange-document", namespaces=NS):
-
-            country = doc.get("country")
-            num = doc.get("doc-number")
-            kind = doc.get("kind")
-
-            if not (country and num and kind):
-                continue
+        async def _search(cql: str, n_terms: int) -> Optional[List[PatentRecord]]:
+            return await _perform_search(session, cql, n_terms, deep_scan)
 
-            pub_id = f"{country}{num}{kind}"
-            if pub_id in seen_ids:
-                continue
-            seen_ids.add(pub_id)
+        record_sets = await run_planned_search_async(
+            queries,
+            _render_cql,
+            _search,
+            MAX_CQL_LENGTH,
+        )
 
-            for abs_elem in doc.xpath(".//ep:abstract[not(@lang='en')]", namespaces=NS):
-                abs_elem.getparent().remove(abs_elem)
+    return _select_documents(record_sets)
 
-            if not doc.xpath(".//ep:abstract[@lang='en']", namespaces=NS):
-                continue
 
-            pub_date = doc.xpath(
-                ".//ep:publication-reference//ep:date/text()",
-                namespaces=NS,
-            )
-            pub_date = pub_date[0] if pub_date else "00000000"
+# ======================================================
+# TEXT RENDERING
+# ======================================================
 
-            docs_with_pub_date.append((pub_date, doc))
-
-    docs_with_pub_date.sort(key=lambda x: x[0], reverse=True)
+def render_patents(records: List[PatentRecord]) -> str:
+    if not records:
+        return "NO PATENTS FOUND."
 
     lines = []
     lines.append("TOP PATENTS — ENGLISH ONLY — RANKED BY PUBLICATION DATE")
     lines.append("=" * 80)
 
-    rank = 1
-    for pub_date, doc in docs_with_pub_date[:MAX_FINAL_PATENTS]:
-
-        country = doc.get("country")
-        num = doc.get("doc-number")
-        kind = doc.get("kind")
-        pid = f"{country}{num}{kind}"
-
-        abstract_text = " ".join(
-            t.strip()
-            for t in doc.xpath(
-                ".//ep:abstract[@lang='en']//ep:p//text()", namespaces=NS
-            )
-            if t.strip()
-        )
+    for rank, doc in enumerate(records, start=1):
+        abstract_text = doc.abstract
 
         lines.append(f"\nRank #{rank}")
-        lines.append(f"Patent ID : {pid}")
-        lines.append(f"Country   : {country}")
-        lines.append(f"Published : {pub_date}")
+        lines.append(f"Patent ID : {doc.pub_id}")
+        lines.append(f"Country   : {doc.country}")
+        lines.append(f"Published : {doc.pub_date}")
         lines.append("Abstract:")
         lines.append(abstract_text[:300] if len(abstract_text) > 300 else abstract_text)
         lines.append("-" * 80)
 
-        rank += 1
-
     return "\n".join(lines)
+
@@ -0,0 +1,95 @@
+# app/services/query_planner.py
+
+"""
+Folds a synonym set into one boolean OR query per upstream.
+
+Synonym expansion gives up to three conditions per request. Upstreams that
+understand boolean syntax (ClinicalTrials.gov Essie, EPO OPS CQL) can answer
+all of them in a single round trip. The planner only falls back to one query
+per term when the combined query is too long or the upstream rejects it.
+"""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, List, Optional, Sequence, TypeVar
+
+logger = logging.getLogger("query-planner")
+
+T = TypeVar("T")
+
+
+class QueryRejected(Exception):
+    """Raised by a search callable when the upstream refuses the query (400/413)."""
+    pass
+
+
+def run_planned_search(
+    terms: Sequence[str],
+    render: Callable[[Sequence[str]], str],
+    search: Callable[[str, int], Optional[T]],
+    max_length: int,
+) -> List[T]:
+    """
+    Input  : terms  – synonym set (already stripped, non-empty)
+             render – builds one upstream query from a subset of terms
+             search – (query, terms_in_query) -> result | None, may raise QueryRejected
+    Output : list of non-empty results (one when combined, up to len(terms) when split)
+    """
+    terms = list(dict.fromkeys(terms))
+    if not terms:
+        return []
+
+    if len(terms) > 1:
+        combined = render(terms)
+        if len(combined) <= max_length:
+            try:
+                result = search(combined, len(terms))
+                return [result] if result else []
+            except QueryRejected:
+                logger.warning("Combined query rejected, splitting → %s", combined)
+        else:
+            logger.info("Combined query too long (%d chars), splitting", len(combined))
+
+    results: List[T] = []
+    for term in terms:
+        try:
+            result = search(render([term]), 1)
+        except QueryRejected:
+            logger.warning("Query rejected → %s", term)
+            continue
+        if result:
+            results.append(result)
+    return results
+
+
+async def run_planned_search_async(
+    terms: Sequence[str],
+    render: Callable[[Sequence[str]], str],
+    search: Callable[[str, int], Awaitable[Optional[T]]],
+    max_length: int,
+) -> List[T]:
+    """Async twin of run_planned_search; split queries run concurrently."""
+    terms = list(dict.fromkeys(terms))
+    if not terms:
+        return []
+
+    if len(terms) > 1:
+        combined = render(terms)
+        if len(combined) <= max_length:
+            try:
+                result = await search(combined, len(terms))
+                return [result] if result else []
+            except QueryRejected:
+                logger.warning("Combined query rejected, splitting → %s", combined)
+        else:
+            logger.info("Combined query too long (%d chars), splitting", len(combined))
+
+    async def _one(term: str) -> Optional[T]:
+        try:
+            return await search(render([term]), 1)
+        except QueryRejected:
+            logger.warning("Query rejected → %s", term)
+            return None
+
+    results = await asyncio.gather(*(_one(t) for t in terms))
+    return [r for r in results if r]
@@ -0,0 +1,57 @@
+# app/services/rate_limiter.py
+
+import asyncio
+import time
+from collections import deque
+from typing import Deque, List
+
+
+class AsyncRateLimiter:
+    """
+    Shared per-provider limiter (GCRA / virtual scheduling).
+
+    Callers `await acquire()` before hitting the provider. Up to `burst`
+    calls go out immediately; after that calls are spaced `1 / rate`
+    seconds apart. Slots are reserved under a lock and the wait happens
+    outside it, so concurrent callers never serialize on the sleep.
+
+    A caller cancelled while waiting gives its slot back once no live
+    reservation follows it, so cancelling a whole fan-out frees all of
+    its slots instead of delaying unrelated callers.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.interval = 1.0 / rate
+        self.burst = max(1, burst)
+        self._tat = 0.0  # theoretical arrival time of the next call
+        self._lock = asyncio.Lock()
+        # reservations still waiting or cancelled, oldest first:
+        # [_tat before it, "waiting" | "cancelled"]
+        self._pending: Deque[List] = deque()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            now = time.monotonic()
+            tat = max(self._tat, now)
+            allow_at = max(now, tat - (self.burst - 1) * self.interval)
+            reservation = [self._tat, "waiting"]
+            self._pending.append(reservation)
+            self._tat = tat + self.interval
+
+        delay = allow_at - now
+        try:
+            if delay > 0:
+                await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            # no await here or in the critical section above, so this runs
+            # atomically on the event loop without taking the lock
+            reservation[1] = "cancelled"
+            while self._pending and self._pending[-1][1] == "cancelled":
+                self._tat = self._pending.pop()[0]
+            raise
+
+        # a used slot ends every rollback before it
+        while self._pending and self._pending.popleft() is not reservation:
+            pass
@@ -0,0 +1,295 @@
+# app/services/text_extraction.py
+
+"""
+Document text extraction off the request path.
+
+PyPDF2 is pure Python and CPU-bound, so PDFs are parsed in a bounded
+process pool: several documents at once, and large PDFs split into page
+ranges that run in parallel. Every document has a deadline that starts
+when its first task starts running, so time spent queued behind other
+documents does not count. A worker stuck on a pathological page is
+interrupted so it cannot hold the pool; a crashed worker costs only the
+documents it was reading, and the pool is rebuilt for the next call.
+
+A document that timed out or whose task failed comes back as None, not
+as empty text, so callers can leave it unindexed and retry it later.
+"""
+
+import io
+import logging
+import multiprocessing
+import os
+import signal
+import math
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from PyPDF2 import PdfReader
+
+from app.config import settings
+
+logger = logging.getLogger("text-extraction")
+
+PAGES_PER_TASK = 16
+# extra parent-side wait past a deadline, for results still in transit
+DEADLINE_GRACE_SECONDS = 1.0
+
+
+class _Deadline(BaseException):
+    # BaseException: PyPDF2 swallows plain Exceptions in its recovery paths
+    pass
+
+
+# ======================================================
+# WORKER SIDE (runs in the pool)
+# ======================================================
+
+def _on_alarm(signum, frame):
+    raise _Deadline()
+
+
+def _extract_pages(
+    pdf_bytes: bytes,
+    start: int,
+    end: Optional[int],
+    timeout: float,
+    deadline: Optional[float] = None,
+) -> Tuple[float, int, List[str], bool]:
+    """
+    Input  : deadline = absolute wall-clock time, or None to allow
+             `timeout` seconds from when this task starts
+    Output : (deadline used, total page count, text of pages [start, end),
+             whether the deadline cut the range short)
+
+    A corrupt, encrypted or image-only PDF yields no text rather than an
+    error; that is a final answer, unlike a timeout.
+    """
+    now = time.time()
+    if deadline is None:
+        deadline = now + timeout
+
+    total = 0
+    pages: List[str] = []
+    if deadline <= now:
+        return deadline, total, pages, True
+
+    timed_out = False
+
+    use_alarm = hasattr(signal, "setitimer")
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _on_alarm)
+        signal.setitimer(signal.ITIMER_REAL, max(deadline - now, 0.01))
+
+    try:
+        reader = PdfReader(io.BytesIO(pdf_bytes))
+        total = len(reader.pages)
+        for i in range(start, min(end if end is not None else total, total)):
+            pages.append(reader.pages[i].extract_text() or "")
+    except _Deadline:
+        timed_out = True
+    except Exception:
+        # unreadable: keep whatever was read
+        pass
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    return deadline, total, pages, timed_out
+
+
+# ======================================================
+# POOL
+# ======================================================
+
+_POOL: Optional[ProcessPoolExecutor] = None
+_POOL_LOCK = threading.Lock()
+
+
+def _workers() -> int:
+    return settings.EXTRACTION_WORKERS or os.cpu_count() or 1
+
+
+def _pool() -> ProcessPoolExecutor:
+    global _POOL
+    if _POOL is None:
+        with _POOL_LOCK:
+            if _POOL is None:
+                # spawn: the API process is multi-threaded, forking it is unsafe
+                _POOL = ProcessPoolExecutor(
+                    max_workers=_workers(),
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _POOL
+
+
+# bounds queued work: documents enter the pool in batches and at most two
+# batches are in flight; further callers block instead of piling blobs
+# into the executor queue
+BATCH_SIZE = max(_workers() * 2, 1)
+_SLOTS_TOTAL = 2
+_SLOTS = threading.BoundedSemaphore(_SLOTS_TOTAL)
+
+
+def _discard_pool(pool: ProcessPoolExecutor) -> None:
+    """Drop a broken pool; the next _pool() call builds a fresh one."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is pool:
+            _POOL = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown() -> None:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is not None:
+            _POOL.shutdown(wait=False, cancel_futures=True)
+            _POOL = None
+
+
+# ======================================================
+# PUBLIC API
+# ======================================================
+
+def _decode_txt(txt_bytes: bytes) -> str:
+    return txt_bytes.decode("utf-8", errors="ignore")
+
+
+def _result(fut: Future, pool: ProcessPoolExecutor):
+    """A finished task's result, or None if it failed, timed out or its worker died."""
+    try:
+        result = fut.result()
+        return None if result[3] else result
+    except BrokenProcessPool:
+        logger.error("PDF extraction worker died; rebuilding the pool")
+        _discard_pool(pool)
+    except Exception:
+        logger.exception("PDF extraction task failed")
+    return None
+
+
+def _extract_batch(documents: Sequence[bytes], timeout: float) -> List[Optional[str]]:
+    """
+    First pass reads the first PAGES_PER_TASK pages of every document in
+    parallel; documents with more pages then fan out the remaining ranges.
+
+    Each document's deadline starts when its first task starts (the worker
+    reports it), and its remaining ranges share that deadline. Workers
+    enforce it themselves; the parent only waits for results.
+    """
+    pool = _pool()
+    # first tasks run `timeout` each, at most _workers() at a time, and may
+    # queue behind the other batch in flight
+    rounds = math.ceil(len(documents) / _workers()) * _SLOTS_TOTAL
+    first_wait = timeout * rounds + DEADLINE_GRACE_SECONDS
+
+    with _SLOTS:
+        try:
+            firsts = [
+                pool.submit(_extract_pages, blob, 0, PAGES_PER_TASK, timeout)
+                for blob in documents
+            ]
+        except RuntimeError:
+            # BrokenProcessPool, or a pool another batch already discarded
+            _discard_pool(pool)
+            return [None] * len(documents)
+        wait(firsts, timeout=first_wait)
+
+        chunks: Dict[int, List[Future]] = {}
+        heads: List[Optional[List[str]]] = []
+        last_deadline = 0.0
+
+        for i, (blob, fut) in enumerate(zip(documents, firsts)):
+            if not fut.done():
+                fut.cancel()
+                logger.warning("PDF extraction timed out | document=%d", i)
+                heads.append(None)
+                continue
+
+            result = _result(fut, pool)
+            if result is None:
+                heads.append(None)
+                continue
+
+            deadline, total, pages, _ = result
+            heads.append(pages)
+
+            if total > PAGES_PER_TASK:
+                if deadline <= time.time():
+                    heads[-1] = None
+                    continue
+                try:
+                    chunks[i] = [
+                        pool.submit(_extract_pages, blob, start, start + PAGES_PER_TASK, timeout, deadline)
+                        for start in range(PAGES_PER_TASK, total, PAGES_PER_TASK)
+                    ]
+                except RuntimeError:
+                    heads[-1] = None
+                    _discard_pool(pool)
+                    break
+                last_deadline = max(last_deadline, deadline)
+
+        pending = [f for futs in chunks.values() for f in futs]
+        if pending:
+            wait(pending, timeout=max(last_deadline - time.time(), 0) + DEADLINE_GRACE_SECONDS)
+
+    texts: List[Optional[str]] = []
+    for i, head in enumerate(heads):
+        pages = None if head is None else list(head)
+        for fut in chunks.get(i, []):
+            result = None
+            if fut.done() and not fut.cancelled():
+                result = _result(fut, pool)
+            else:
+                fut.cancel()
+            if result is None:
+                pages = None
+            elif pages is not None:
+                pages.extend(result[2])
+        if pages is None:
+            logger.warning("PDF extraction incomplete | document=%d", i)
+        texts.append(None if pages is None else "\n".join(pages))
+    # documents after a submit failure
+    texts.extend([None] * (len(documents) - len(texts)))
+    return texts
+
+
+def extract_pdf_texts(
+    documents: Sequence[bytes],
+    timeout: Optional[float] = None,
+) -> List[Optional[str]]:
+    """
+    Input  : raw PDF blobs
+    Output : extracted text per blob, same order (None on failure / timeout)
+    """
+    timeout = timeout or settings.EXTRACTION_TIMEOUT_SECONDS
+    texts: List[Optional[str]] = []
+    for i in range(0, len(documents), BATCH_SIZE):
+        texts.extend(_extract_batch(documents[i:i + BATCH_SIZE], timeout))
+    return texts
+
+
+def extract_documents(
+    items: Sequence[Tuple[str, bytes]],
+) -> List[Optional[Tuple[str, Optional[str]]]]:
+    """
+    Input  : (file name, bytes) pairs
+    Output : (document_type, text) per item, None for unsupported types;
+             text is None when extraction failed or timed out
+    """
+    results: List[Optional[Tuple[str, Optional[str]]]] = [None] * len(items)
+
+    pdf_slots = []
+    for i, (name, blob) in enumerate(items):
+        if name.endswith(".pdf"):
+            pdf_slots.append(i)
+        elif name.endswith(".txt"):
+            results[i] = ("txt", _decode_txt(blob))
+
+    texts = extract_pdf_texts([items[i][1] for i in pdf_slots])
+    for i, text in zip(pdf_slots, texts):
+        results[i] = ("pdf", text)
+
+    return results
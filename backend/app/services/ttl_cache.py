@@ -0,0 +1,122 @@
+# app/services/ttl_cache.py
+
+import json
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+_TABLE_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+# expired rows are deleted opportunistically, once per this many writes
+PURGE_EVERY_WRITES = 500
+
+
+class SQLiteTTLCache:
+    """
+    Small persistent key → JSON cache with per-entry expiry.
+
+    One table per cache, any number of caches per SQLite file. The
+    connection is opened lazily and shared across threads behind a lock;
+    WAL mode keeps readers from blocking on the occasional writer.
+    """
+
+    def __init__(self, path: str | Path, table: str, ttl_seconds: float):
+        if not _TABLE_RE.match(table):
+            raise ValueError(f"Invalid cache table name: {table!r}")
+        self.path = str(path)
+        self.table = table
+        self.ttl_seconds = ttl_seconds
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(
+                self.path,
+                check_same_thread=False,
+                isolation_level=None,
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                "key TEXT PRIMARY KEY, "
+                "value TEXT NOT NULL, "
+                "expires_at REAL NOT NULL)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            row = self._connect().execute(
+                f"SELECT value FROM {self.table} WHERE key = ? AND expires_at > ?",
+                (key, time.time()),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        expires_at = time.time() + (ttl_seconds or self.ttl_seconds)
+        payload = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._connect().execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at) "
+                "VALUES (?, ?, ?)",
+                (key, payload, expires_at),
+            )
+        self._wrote(1)
+
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        if not keys:
+            return {}
+        placeholders = ",".join("?" * len(keys))
+        with self._lock:
+            rows = self._connect().execute(
+                f"SELECT key, value FROM {self.table} "
+                f"WHERE key IN ({placeholders}) AND expires_at > ?",
+                (*keys, time.time()),
+            ).fetchall()
+        return {k: json.loads(v) for k, v in rows}
+
+    def set_many(
+        self,
+        items: Iterable[Tuple[str, Any]],
+        ttl_seconds: Optional[float] = None,
+    ) -> None:
+        expires_at = time.time() + (ttl_seconds or self.ttl_seconds)
+        rows = [(k, json.dumps(v, ensure_ascii=False), expires_at) for k, v in items]
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN")
+            try:
+                conn.executemany(
+                    f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at) "
+                    "VALUES (?, ?, ?)",
+                    rows,
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        self._wrote(len(rows))
+
+    def _wrote(self, count: int) -> None:
+        with self._lock:
+            self._writes += count
+            due = self._writes >= PURGE_EVERY_WRITES
+            if due:
+                self._writes = 0
+        if due:
+            self.purge_expired()
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            cur = self._connect().execute(
+                f"DELETE FROM {self.table} WHERE expires_at <= ?",
+                (time.time(),),
+            )
+        return cur.rowcount
@@ -0,0 +1,326 @@
+# app/services/vector_index.py
+
+"""
+CPU-only semantic recall over document passages.
+
+Per company, passages are vectorised with sublinear TF-IDF into a CSR
+matrix. Companies with enough passages also get an LSA projection
+(truncated SVD, computed with a randomized range finder), which lets a
+query about "fatty liver" reach passages that only say "NASH" or
+"steatohepatitis" when the corpus uses them together.
+
+Arrays are written once per corpus version and opened with
+mmap_mode="r"; queries are batched into one matrix product.
+"""
+
+import json
+import logging
+import math
+import re
+import shutil
+import tempfile
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.services.document_index import DOCUMENT_INDEX
+
+logger = logging.getLogger("vector-index")
+
+MAX_FEATURES = 50_000
+LSA_COMPONENTS = 128
+LSA_MIN_PASSAGES = 64
+SVD_OVERSAMPLE = 10
+SVD_POWER_ITERATIONS = 2
+ROW_BLOCK = 4096
+# published versions kept per company; other workers may still have an
+# older one open, and a newer one may land from a concurrent build
+KEEP_VERSIONS = 3
+STALE_BUILD_SECONDS = 60 * 60
+
+_TOKEN_RE = re.compile(r"[a-z0-9]{2,}")
+
+STOPWORDS = frozenset(
+    "the and for with that this from are was were has have had not but "
+    "its their which into than then also been being such can may will "
+    "all any each other more most these those there where when what".split()
+)
+
+
+def _tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+# ======================================================
+# CSR HELPERS (numpy only)
+# ======================================================
+
+def _csr_matmul(indptr, indices, data, dense: np.ndarray) -> np.ndarray:
+    """(n_rows × n_cols CSR) @ (n_cols × m) → (n_rows × m), in row blocks."""
+    n_rows = len(indptr) - 1
+    out = np.zeros((n_rows, dense.shape[1]), dtype=np.float32)
+    for start in range(0, n_rows, ROW_BLOCK):
+        stop = min(start + ROW_BLOCK, n_rows)
+        lo, hi = indptr[start], indptr[stop]
+        if lo == hi:
+            continue
+        contrib = data[lo:hi, None] * dense[indices[lo:hi]]
+        rows = np.repeat(np.arange(stop - start), np.diff(indptr[start:stop + 1]))
+        block = np.zeros((stop - start, dense.shape[1]), dtype=np.float32)
+        np.add.at(block, rows, contrib)
+        out[start:stop] = block
+    return out
+
+
+def _csr_rmatmul(indptr, indices, data, dense: np.ndarray, n_cols: int) -> np.ndarray:
+    """(CSR)ᵀ @ (n_rows × m) → (n_cols × m), in row blocks."""
+    n_rows = len(indptr) - 1
+    out = np.zeros((n_cols, dense.shape[1]), dtype=np.float32)
+    for start in range(0, n_rows, ROW_BLOCK):
+        stop = min(start + ROW_BLOCK, n_rows)
+        lo, hi = indptr[start], indptr[stop]
+        if lo == hi:
+            continue
+        rows = np.repeat(np.arange(start, stop), np.diff(indptr[start:stop + 1]))
+        np.add.at(out, indices[lo:hi], data[lo:hi, None] * dense[rows])
+    return out
+
+
+def _normalize_rows(m: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(m, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (m / norms).astype(np.float32)
+
+
+# ======================================================
+# BUILD
+# ======================================================
+
+def build_vectors(texts: Sequence[str], seed: int = 0) -> Dict[str, np.ndarray]:
+    """
+    Input  : passage texts
+    Output : arrays for one corpus version (CSR TF-IDF, idf, optional LSA)
+    """
+    docs = [Counter(_tokenize(t)) for t in texts]
+    n = len(docs)
+
+    df = Counter()
+    for counts in docs:
+        df.update(counts.keys())
+
+    terms = [t for t, _ in df.most_common(MAX_FEATURES)]
+    vocab = {t: i for i, t in enumerate(terms)}
+    idf = np.array(
+        [math.log((1 + n) / (1 + df[t])) + 1.0 for t in terms],
+        dtype=np.float32,
+    )
+
+    indptr = [0]
+    indices: List[int] = []
+    data: List[float] = []
+    for counts in docs:
+        cols = [vocab[t] for t in counts if t in vocab]
+        weights = np.array(
+            [(1.0 + math.log(counts[terms[c]])) * idf[c] for c in cols],
+            dtype=np.float32,
+        )
+        norm = float(np.linalg.norm(weights)) or 1.0
+        indices.extend(cols)
+        data.extend((weights / norm).tolist())
+        indptr.append(len(indices))
+
+    arrays = {
+        "indptr": np.asarray(indptr, dtype=np.int64),
+        "indices": np.asarray(indices, dtype=np.int32),
+        "data": np.asarray(data, dtype=np.float32),
+        "idf": idf,
+        "terms": np.asarray(terms, dtype=np.str_),
+    }
+
+    k = min(LSA_COMPONENTS, n - 1, len(terms) - 1)
+    if n >= LSA_MIN_PASSAGES and k > 0:
+        arrays["components"], arrays["embeddings"] = _lsa(arrays, len(terms), k, seed)
+
+    return arrays
+
+
+def _lsa(arrays: Dict[str, np.ndarray], n_cols: int, k: int, seed: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Randomized truncated SVD (Halko et al.) of the CSR TF-IDF matrix."""
+    csr = (arrays["indptr"], arrays["indices"], arrays["data"])
+    rng = np.random.default_rng(seed)
+
+    omega = rng.standard_normal((n_cols, k + SVD_OVERSAMPLE)).astype(np.float32)
+    q, _ = np.linalg.qr(_csr_matmul(*csr, omega))
+    for _ in range(SVD_POWER_ITERATIONS):
+        z, _ = np.linalg.qr(_csr_rmatmul(*csr, q, n_cols))
+        q, _ = np.linalg.qr(_csr_matmul(*csr, z))
+
+    b_t = _csr_rmatmul(*csr, q, n_cols)            # (Qᵀ A)ᵀ, n_cols × (k + p)
+    _, _, vt = np.linalg.svd(b_t.T, full_matrices=False)
+    components = np.ascontiguousarray(vt[:k].T, dtype=np.float32)   # n_cols × k
+
+    embeddings = _normalize_rows(_csr_matmul(*csr, components))
+    return components, embeddings
+
+
+# ======================================================
+# QUERY
+# ======================================================
+
+class CompanyVectors:
+    def __init__(self, arrays: Dict[str, np.ndarray], passage_ids: np.ndarray):
+        self.indptr = arrays["indptr"]
+        self.indices = arrays["indices"]
+        self.data = arrays["data"]
+        self.idf = arrays["idf"]
+        self.components = arrays.get("components")
+        self.embeddings = arrays.get("embeddings")
+        self.passage_ids = passage_ids
+        self.vocab = {str(t): i for i, t in enumerate(arrays["terms"])}
+
+    def _query_matrix(self, queries: Sequence[str]) -> np.ndarray:
+        q = np.zeros((len(queries), len(self.vocab)), dtype=np.float32)
+        for row, text in enumerate(queries):
+            for term, count in Counter(_tokenize(text)).items():
+                col = self.vocab.get(term)
+                if col is not None:
+                    q[row, col] = (1.0 + math.log(count)) * self.idf[col]
+        return _normalize_rows(q)
+
+    def search(self, queries: Sequence[str], k: int) -> List[List[Tuple[int, float]]]:
+        """Cosine top-k per query, all queries in one matrix product."""
+        if not queries or not len(self.passage_ids):
+            return [[] for _ in queries]
+
+        q = self._query_matrix(queries)
+        if self.embeddings is not None:
+            scores = self.embeddings @ _normalize_rows(q @ self.components).T
+        else:
+            scores = _csr_matmul(self.indptr, self.indices, self.data, q.T)
+
+        k = min(k, scores.shape[0])
+        top = np.argpartition(-scores, k - 1, axis=0)[:k]
+
+        results = []
+        for col in range(scores.shape[1]):
+            idx = top[:, col]
+            idx = idx[np.argsort(-scores[idx, col])]
+            results.append([
+                (int(self.passage_ids[i]), float(scores[i, col]))
+                for i in idx if scores[i, col] > 0
+            ])
+        return results
+
+
+# ======================================================
+# PERSISTENCE (ONE DIRECTORY PER CORPUS VERSION)
+# ======================================================
+
+class VectorIndex:
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+        self._loaded: Dict[int, Tuple[str, CompanyVectors]] = {}
+        # one build per company at a time; companies never wait on each other
+        self._locks: Dict[int, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    def _lock(self, company_id: int) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(company_id, threading.Lock())
+
+    def _dir(self, company_id: int, signature: str) -> Path:
+        return self.root / str(company_id) / signature
+
+    def _save(self, target: Path, arrays: Dict[str, np.ndarray], passage_ids: np.ndarray) -> None:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        # unique build directory: concurrent workers never share one
+        tmp = Path(tempfile.mkdtemp(dir=target.parent, prefix=f"{target.name}.", suffix=".tmp"))
+        for name, array in {**arrays, "passage_ids": passage_ids}.items():
+            np.save(tmp / f"{name}.npy", array)
+        (tmp / "meta.json").write_text(json.dumps({
+            "passages": int(len(passage_ids)),
+            "features": int(len(arrays["terms"])),
+            "lsa": "components" in arrays,
+        }))
+        try:
+            tmp.replace(target)
+        except OSError:
+            # another worker published the same version first
+            shutil.rmtree(tmp, ignore_errors=True)
+            if not target.is_dir():
+                raise
+
+        self._prune(target)
+
+    def _prune(self, target: Path) -> None:
+        """Drop all but the KEEP_VERSIONS newest versions, and abandoned builds."""
+        now = time.time()
+        versions = []
+        for entry in target.parent.iterdir():
+            try:
+                mtime = entry.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            if entry.name.endswith(".tmp"):
+                # another worker's build in progress, unless long abandoned
+                if now - mtime > STALE_BUILD_SECONDS:
+                    shutil.rmtree(entry, ignore_errors=True)
+            elif entry != target:
+                versions.append((mtime, entry))
+
+        versions.sort(reverse=True)
+        for _, old in versions[KEEP_VERSIONS - 1:]:
+            shutil.rmtree(old, ignore_errors=True)
+
+    def _open(self, directory: Path) -> CompanyVectors:
+        arrays = {
+            p.stem: np.load(p, mmap_mode="r")
+            for p in directory.glob("*.npy")
+        }
+        return CompanyVectors(arrays, arrays.pop("passage_ids"))
+
+    def refresh(self, company_id: int) -> Optional[CompanyVectors]:
+        """Current vectors for the company, rebuilt if its passages changed."""
+        signature = DOCUMENT_INDEX.passage_signature(company_id)
+
+        with self._lock(company_id):
+            cached = self._loaded.get(company_id)
+            if cached and cached[0] == signature:
+                return cached[1]
+
+            target = self._dir(company_id, signature)
+            if not target.is_dir():
+                passages = DOCUMENT_INDEX.passages(company_id)
+                if not passages:
+                    self._loaded.pop(company_id, None)
+                    return None
+                ids = np.array([pid for pid, _ in passages], dtype=np.int64)
+                arrays = build_vectors([text for _, text in passages])
+                self._save(target, arrays, ids)
+                logger.info(
+                    "Vector index built | company=%s | passages=%d | features=%d | lsa=%s",
+                    company_id, len(ids), len(arrays["terms"]), "components" in arrays,
+                )
+
+            vectors = self._open(target)
+            self._loaded[company_id] = (signature, vectors)
+            return vectors
+
+    def search(
+        self,
+        company_id: int,
+        queries: Sequence[str],
+        k: int,
+    ) -> List[List[Tuple[int, float]]]:
+        vectors = self.refresh(company_id)
+        if vectors is None:
+            return [[] for _ in queries]
+        return vectors.search(queries, k)
+
+
+VECTOR_INDEX = VectorIndex(settings.VECTOR_INDEX_DIR)
@@ -0,0 +1,192 @@
+# app/services/visualization_builder.py
+
+"""
+Chart payloads built straight from typed evidence.
+
+Market timelines come from the market agent's numeric fields and the
+trial chart from compute_signals() output — no text parsing. Forecast
+bands are Monte Carlo quantiles (services/forecast.py), computed for one
+pair or a whole batch at once. Results are cached on the EvidenceBundle.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.config import settings
+from app.services.evidence import (
+    ClinicalEvidence,
+    EvidenceBundle,
+    MarketEvidence,
+    MarketFigures,
+)
+from app.services.forecast import (
+    FORECAST_YEAR,
+    QUANTILE_NAMES,
+    central_cagr,
+    simulate_bands,
+)
+
+PHASE_BUCKETS = ("PHASE1", "PHASE2", "PHASE3", "PHASE4", "OTHER")
+PHASE_ALIASES = {"EARLY_PHASE1": "PHASE1"}
+
+
+def _timeline(years: np.ndarray, values: np.ndarray) -> List[Dict[str, float]]:
+    return [
+        {"year": int(y), "value": float(v)}
+        for y, v in zip(years, values)
+    ]
+
+
+# ======================================================
+# MARKET
+# ======================================================
+
+def market_timeline(
+    current: float,
+    cagr: float,
+    forecast: Optional[float],
+    start_year: int,
+    end_year: int = FORECAST_YEAR,
+) -> List[Dict[str, float]]:
+    """
+    Point forecast compounding the same central rate as the bands
+    (central_cagr), so it reaches the dataset forecast in FORECAST_YEAR
+    without a jump and tracks the simulated median.
+    """
+    rate = central_cagr(
+        np.array([current], dtype=np.float64),
+        np.array([cagr], dtype=np.float64),
+        np.array([np.nan if forecast is None else forecast], dtype=np.float64),
+        start_year,
+    )[0]
+    years = np.arange(start_year, end_year + 1)
+    values = np.round(current * (1.0 + rate / 100.0) ** (years - start_year), 2)
+    return _timeline(years, values)
+
+
+def build_market_bands(
+    figures: Sequence[MarketFigures],
+    start_year: Optional[int] = None,
+) -> List[Optional[Dict[str, Any]]]:
+    """
+    Input  : market figures for any number of drug/condition pairs
+    Output : p10/p50/p90 timelines per pair (one simulation for the batch);
+             None for pairs without a current market size
+    """
+    if not figures:
+        return []
+
+    def _num(value: Optional[float]) -> float:
+        return np.nan if value is None else value
+
+    years, bands = simulate_bands(
+        [_num(f.current_usd_bn) for f in figures],
+        [_num(f.cagr_percent) for f in figures],
+        [_num(f.forecast_2030_usd_bn) for f in figures],
+        start_year or datetime.now().year,
+    )
+
+    out: List[Optional[Dict[str, Any]]] = []
+    for pair in bands:
+        if np.isnan(pair).all():
+            out.append(None)
+            continue
+        block = {name: _timeline(years, row) for name, row in zip(QUANTILE_NAMES, pair)}
+        # earlier payloads had upper / lower envelopes
+        block["upper"] = block["p90"]
+        block["lower"] = block["p10"]
+        block["paths"] = settings.FORECAST_PATHS
+        out.append(block)
+    return out
+
+
+def build_market_block(
+    figures: MarketFigures,
+    start_year: Optional[int] = None,
+) -> Optional[Dict[str, Any]]:
+    current = figures.current_usd_bn
+    if not current:
+        return None
+
+    start_year = start_year or datetime.now().year
+    cagr = figures.cagr_percent or 0
+    forecast = figures.forecast_2030_usd_bn
+    base = market_timeline(current, cagr, forecast, start_year)
+
+    if forecast is None and base:
+        forecast = base[-1]["value"]
+
+    block: Dict[str, Any] = {
+        "current_usd_bn": round(current, 2),
+        "forecast_2030_usd_bn": forecast,
+        "cagr_percent": cagr,
+        "timeline": base,
+        "bands": build_market_bands([figures], start_year)[0],
+    }
+
+    population = figures.patient_population_m
+    treated_pct = figures.treated_percent
+    if population is not None and treated_pct is not None:
+        treated_pop = round(population * treated_pct / 100, 2)
+        block["patient_split"] = {
+            "total_population_m": population,
+            "treated_population_m": treated_pop,
+            "untreated_population_m": round(population - treated_pop, 2),
+            "treated_percent": treated_pct,
+        }
+
+    return block
+
+
+# ======================================================
+# CLINICAL
+# ======================================================
+
+def build_clinical_block(signals: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Input  : compute_signals() output
+    Output : trial counts per phase bucket, None without trials
+    """
+    by_phase = dict.fromkeys(PHASE_BUCKETS, 0)
+    for phase, count in (signals.get("phase_distribution") or {}).items():
+        phase = PHASE_ALIASES.get(phase, phase)
+        by_phase[phase if phase in by_phase else "OTHER"] += count
+
+    total = sum(by_phase.values())
+    if total == 0:
+        return None
+
+    return {
+        "total_trials": total,
+        "by_phase": by_phase,
+    }
+
+
+# ======================================================
+# ENTRY POINTS
+# ======================================================
+
+def build_visualizations(
+    market: Optional[MarketEvidence],
+    clinical: Optional[ClinicalEvidence],
+) -> Dict[str, Any]:
+    return {
+        "market": build_market_block(market.figures) if market and market.figures else None,
+        "clinical": build_clinical_block(clinical.signals) if clinical else None,
+    }
+
+
+def bundle_visualizations(bundle: EvidenceBundle) -> Optional[Dict[str, Any]]:
+    """Chart payload for a bundle, built once and kept with the cached evidence."""
+    if bundle.visualizations is None:
+        bundle.visualizations = build_visualizations(
+            bundle.get("market"),
+            bundle.get("clinical"),
+        )
+
+    viz = bundle.visualizations
+    if not viz["market"] and not viz["clinical"]:
+        return None
+    return viz